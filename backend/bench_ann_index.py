@@ -0,0 +1,63 @@
+"""
+Benchmark the IVF index against exact search: recall@k and p50/p99 latency per nprobe.
+
+The synthetic corpus is drawn around many cluster centres, which is closer
+to real embedding distributions than uniform noise.
+
+Usage: python bench_ann_index.py [chunks] [dim] [nlist]
+"""
+import sys
+import time
+
+import numpy as np
+
+from knowledge.ann import IVFIndex
+from knowledge.index import VectorIndex
+
+K = 10
+QUERIES = 200
+
+
+def corpus(rng, count, dim, centers):
+    means = rng.standard_normal((centers, dim), dtype=np.float32)
+    return means[rng.integers(0, centers, size=count)] + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+
+
+def latencies(search, queries):
+    timings = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        ids, _ = search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+        results.append(ids)
+    timings.sort()
+    return results, timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+    nlist = int(sys.argv[3]) if len(sys.argv) > 3 else int(4 * np.sqrt(chunks))
+    rng = np.random.default_rng(0)
+    vectors = corpus(rng, chunks, dim, centers=nlist // 2)
+    queries = corpus(rng, QUERIES, dim, centers=nlist // 2)
+
+    print(f"=== IVF benchmark ({chunks} chunks, dim {dim}, nlist {nlist}, k {K}) ===")
+    exact = VectorIndex(dim=dim, capacity=chunks)
+    exact.add(np.arange(chunks), vectors)
+
+    started = time.perf_counter()
+    ivf = IVFIndex(dim=dim, nlist=nlist)
+    ivf.train(vectors)
+    ivf.add(np.arange(chunks), vectors)
+    print(f"train + add: {time.perf_counter() - started:.1f} s")
+
+    truth, p50, p99 = latencies(lambda query: exact.search(query, k=K), queries)
+    print(f"{'exact':<12} recall@{K} 1.000   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+    for nprobe in (1, 4, 8, 16, 32, 64):
+        if nprobe > nlist:
+            break
+        found, p50, p99 = latencies(lambda query: ivf.search(query, k=K, nprobe=nprobe), queries)
+        recall = np.mean([len(set(a) & set(e)) / K for a, e in zip(found, truth)])
+        print(f"nprobe {nprobe:<5} recall@{K} {recall:.3f}   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
@@ -0,0 +1,54 @@
+"""
+Benchmark BM25 keyword search latency on one knowledge-base document.
+
+Usage: python bench_keyword_index.py [chunks] [words per chunk]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from knowledge.keyword import KeywordIndex, KeywordIndexBuilder
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    rng = np.random.default_rng(0)
+    # Zipf-distributed vocabulary, like natural text
+    vocabulary = [f"w{i}" for i in range(50_000)]
+
+    print(f"=== Keyword index benchmark ({chunks} chunks, {words} words each) ===")
+    builder = KeywordIndexBuilder()
+    started = time.perf_counter()
+    for chunk_id in range(chunks):
+        picks = np.minimum(rng.zipf(1.2, words), len(vocabulary)) - 1
+        text = " ".join(vocabulary[i] for i in picks)
+        if chunk_id % 997 == 0:
+            text += f" SKU-{chunk_id}"
+        builder.add(chunk_id, text)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "doc.bm25")
+        builder.save(path)
+        print(f"build: {time.perf_counter() - started:.1f} s, file {os.path.getsize(path) / 1e6:.1f} MB")
+
+        started = time.perf_counter()
+        index = KeywordIndex(path)
+        print(f"open:  {(time.perf_counter() - started) * 1000:.1f} ms ({len(index.terms)} terms)")
+
+        queries = {
+            "identifier": "where is SKU-997",
+            "rare words": "w4000 w12000 w30000",
+            "typical": "w40 w150 w900 w2500 w7000",
+            "common words": "w0 w1 w2 w3",
+        }
+        for name, query in queries.items():
+            index.search(query, 20)  # warm up
+            timings = []
+            for _ in range(20):
+                started = time.perf_counter()
+                index.search(query, 20)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"{name:>12}: p50 {timings[len(timings) // 2]:7.2f} ms   p95 {timings[int(len(timings) * 0.95)]:7.2f} ms")
@@ -0,0 +1,66 @@
+"""
+Benchmark chat requests/sec under the old debug logging and the production logging mode.
+
+Each mode runs in a fresh interpreter (logging is configured when main is
+imported) and sends its log output to a temporary file, like a real deployment.
+
+Usage: python bench_logging.py [requests]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {
+    "debug + SQL echo (old default)": {"LOG_MODE": "development", "LOG_LEVEL": "DEBUG", "SQL_ECHO": "true"},
+    "development": {"LOG_MODE": "development", "LOG_LEVEL": "INFO", "SQL_ECHO": "false"},
+    "production (queue + JSON)": {"LOG_MODE": "production", "LOG_LEVEL": "INFO", "SQL_ECHO": "false"},
+}
+
+
+async def run_requests(count: int) -> float:
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up the pools and the session store
+        await client.post("/api/chat/", json={"message": "warm up"})
+        started = time.perf_counter()
+        for i in range(count):
+            await client.post("/api/chat/", json={"message": f"Question {i}"})
+        return count / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(f"{asyncio.run(run_requests(int(sys.argv[2]))):.0f}")
+        sys.exit(0)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"=== Logging benchmark ({count} POST /api/chat/ requests) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, env in MODES.items():
+            # One chat_history insert per request, so SQL echo is exercised per request
+            child_env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                KNOWLEDGE_DIR=os.path.join(tmp, "knowledge"),
+                LLM_CACHE_DB_PATH=os.path.join(tmp, "llm_cache.db"),
+                SESSION_DB_PATH=os.path.join(tmp, "sessions.db"),
+                CHAT_HISTORY_BATCH_SIZE="1",
+                **env
+            )
+            child_env.setdefault("SECRET_KEY", "bench")
+            with open(os.path.join(tmp, "app.log"), "w") as log_file:
+                result = subprocess.run(
+                    [sys.executable, __file__, "--child", str(count)],
+                    env=child_env,
+                    stdout=subprocess.PIPE,
+                    stderr=log_file,
+                    text=True,
+                    check=True,
+                )
+            print(f"{name:<32} {result.stdout.strip().splitlines()[-1]:>8} req/s")
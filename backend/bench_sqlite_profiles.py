@@ -0,0 +1,71 @@
+"""
+Benchmark chat-history insert and read throughput under each SQLite profile.
+
+Usage: python bench_sqlite_profiles.py [rows]
+"""
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+
+from database.models import Base, ChatHistory
+from database.sqlite import SQLITE_PROFILES, apply_sqlite_pragmas, resolve_pragmas
+
+SESSIONS = 50
+
+
+def make_rows(count: int):
+    return [
+        {
+            "session_id": f"session-{i % SESSIONS}",
+            "user_message": f"Question number {i}?",
+            "ai_response": "You said: " + "lorem ipsum " * 20,
+            "timestamp": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+
+def bench_profile(profile: str, rows: int, workdir: Path) -> dict:
+    engine = create_engine(f"sqlite:///{workdir / (profile + '.db')}")
+    apply_sqlite_pragmas(engine, resolve_pragmas(profile))
+    Base.metadata.create_all(bind=engine)
+    table = ChatHistory.__table__
+    data = make_rows(rows)
+
+    # One commit per row, as the chat endpoint used to do
+    single = data[: max(rows // 10, 1)]
+    started = time.perf_counter()
+    for row in single:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), row)
+    per_commit = len(single) / (time.perf_counter() - started)
+
+    # One executemany per batch of 100, as the chat history writer does
+    started = time.perf_counter()
+    for offset in range(0, rows, 100):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), data[offset:offset + 100])
+    batched = rows / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(SESSIONS * 4):
+        with engine.connect() as conn:
+            conn.execute(select(table).where(table.c.session_id == f"session-{i % SESSIONS}")).fetchall()
+    reads = SESSIONS * 4 / (time.perf_counter() - started)
+
+    engine.dispose()
+    return {"per_commit": per_commit, "batched": batched, "reads": reads}
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"=== SQLite profile benchmark ({rows} chat_history rows) ===")
+    print(f"{'profile':<10} {'inserts/s (commit each)':>24} {'inserts/s (batched)':>20} {'session reads/s':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in SQLITE_PROFILES:
+            result = bench_profile(profile, rows, Path(tmp))
+            print(f"{profile:<10} {result['per_commit']:>24.0f} {result['batched']:>20.0f} {result['reads']:>16.0f}")
@@ -0,0 +1,33 @@
+"""
+Benchmark exact top-k retrieval latency on the NumPy vector index.
+
+Usage: python bench_vector_index.py [chunks] [dim]
+"""
+import sys
+import time
+
+import numpy as np
+
+from knowledge.index import VectorIndex
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    rng = np.random.default_rng(0)
+
+    print(f"=== Vector index benchmark ({chunks} chunks, dim {dim}) ===")
+    index = VectorIndex(dim=dim, capacity=chunks)
+    for start in range(0, chunks, 100_000):
+        count = min(100_000, chunks - start)
+        index.add(np.arange(start, start + count), rng.standard_normal((count, dim), dtype=np.float32))
+
+    for batch in (1, 8, 32):
+        queries = rng.standard_normal((batch, dim), dtype=np.float32)
+        index.search_batch(queries, k=10)  # warm up
+        timings = []
+        for _ in range(10):
+            started = time.perf_counter()
+            index.search_batch(queries, k=10)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"batch {batch:>3}: p50 {timings[len(timings) // 2]:8.2f} ms   per query {timings[len(timings) // 2] / batch:7.2f} ms")
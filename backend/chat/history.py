@@ -0,0 +1,144 @@
+"""
+Background, batched writer for chat history.
+
+Request handlers enqueue ``ChatHistory`` rows instead of committing them
+one by one; a background task flushes the queue in bulk (one executemany
+per batch) whenever ``batch_size`` rows are waiting or ``flush_interval``
+seconds have passed since the first queued row.
+
+Durability modes:
+
+- ``buffered``: ``write`` returns as soon as the row is queued. Rows still
+  queued when the process dies are lost.
+- ``durable``: ``write`` waits until the batch containing the row has been
+  committed (group commit), so the response is only sent once it is stored.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from database.database import AsyncSessionLocal
+from database.models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("buffered", "durable")
+
+
+async def insert_chat_rows(rows: List[Dict[str, Any]]) -> None:
+    """Insert ``rows`` into chat_history in a single transaction"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await db.execute(ChatHistory.__table__.insert(), rows)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+class ChatHistoryWriter:
+    """Queues chat history rows and writes them in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        durability: str = "buffered",
+        insert_rows: Callable[[List[Dict[str, Any]]], Awaitable[None]] = insert_chat_rows,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown chat history durability mode: {durability}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.insert_rows = insert_rows
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the flush loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the flush loop"""
+        if self._task is None:
+            return
+        # The sentinel is queued behind every pending row, so they all get written
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def write(self, session_id: str, user_message: str, ai_response: str, context: Optional[str] = None) -> None:
+        """Queue a chat history row (and wait for it to be committed in durable mode)"""
+        self.start()
+        row = {
+            "session_id": session_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "context": context,
+            "timestamp": datetime.utcnow(),
+        }
+        if self.durability == "durable":
+            committed = asyncio.get_running_loop().create_future()
+            await self._queue.put((row, committed))
+            await committed
+        else:
+            await self._queue.put((row, None))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            await self.insert_rows(rows)
+        except Exception as e:
+            self.rows_failed += len(rows)
+            logger.error(f"Error saving {len(rows)} chat history rows: {str(e)}")
+            for _, committed in batch:
+                if committed is not None and not committed.done():
+                    committed.set_exception(e)
+            return
+        self.rows_written += len(rows)
+        self.batches += 1
+        for _, committed in batch:
+            if committed is not None and not committed.done():
+                committed.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "durability": self.durability,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "avg_batch_size": self.rows_written / self.batches if self.batches else 0.0,
+        }
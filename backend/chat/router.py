@@ -1,23 +1,71 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 import os
+import json
 import logging
 import uuid
-from datetime import datetime
 
 # Database
-from sqlalchemy.orm import Session
-from database.database import get_db
-from database.models import ChatHistory
+from database.database import DB_DIR
+from chat.history import ChatHistoryWriter
+from chat.semantic_cache import SemanticCache
+
+# Model providers
+from llm.providers import get_provider
+from llm.cache import cached_generate, get_response_cache, in_flight
+
+import config
+from chat.sessions import (
+    SessionStore, SessionBackend, InMemorySessionBackend, SQLiteSessionBackend, TieredSessionBackend
+)
 
 # Initialize router
 router = APIRouter(prefix="/chat", tags=["Chat"])
 logger = logging.getLogger(__name__)
 
-# Simple in-memory session store (replace with a proper session store in production)
-sessions = {}
+def create_session_backend() -> SessionBackend:
+    """Build the session backend selected by SESSION_BACKEND"""
+    if config.SESSION_BACKEND == "memory":
+        return InMemorySessionBackend(
+            max_sessions=config.SESSION_MAX_ENTRIES,
+            idle_ttl=config.SESSION_IDLE_TTL_SECONDS
+        )
+    if config.SESSION_BACKEND == "sqlite":
+        # Shared across uvicorn workers, with a short-lived per-process L1
+        return TieredSessionBackend(
+            l1=InMemorySessionBackend(
+                max_sessions=config.SESSION_MAX_ENTRIES,
+                idle_ttl=config.SESSION_L1_TTL_SECONDS,
+                refresh_on_read=False
+            ),
+            l2=SQLiteSessionBackend(
+                config.SESSION_DB_PATH or str(DB_DIR / "sessions.db"),
+                idle_ttl=config.SESSION_IDLE_TTL_SECONDS
+            )
+        )
+    raise ValueError(f"Unknown session backend: {config.SESSION_BACKEND}")
+
+# Chat history is written in batches off the request path
+history_writer = ChatHistoryWriter(
+    batch_size=config.CHAT_HISTORY_BATCH_SIZE,
+    flush_interval=config.CHAT_HISTORY_FLUSH_INTERVAL_SECONDS,
+    durability=config.CHAT_HISTORY_DURABILITY
+)
+
+# Bounded LRU + idle-TTL session store
+session_store = SessionStore(
+    create_session_backend(),
+    sweep_interval=config.SESSION_SWEEP_INTERVAL_SECONDS
+)
+
+# Near-duplicate messages reuse an earlier answer (off unless SEMANTIC_CACHE_ENABLED)
+semantic_cache = SemanticCache(
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=config.SEMANTIC_CACHE_TTL_SECONDS
+) if config.SEMANTIC_CACHE_ENABLED else None
 
 class ChatRequest(BaseModel):
     message: str
@@ -29,44 +77,54 @@ class ChatResponse(BaseModel):
     session_id: str
     context: Optional[Dict[str, Any]] = None
 
-def get_or_create_session(session_id: str = None) -> str:
+async def get_or_create_session(session_id: str = None) -> str:
     """Get existing session or create a new one"""
-    if not session_id or session_id not in sessions:
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = {
-            "created_at": datetime.utcnow(),
-            "last_activity": datetime.utcnow()
-        }
-    return session_id
+    return await session_store.get_or_create(session_id)
 
-def generate_response(message: str) -> str:
-    """Generate a response to the user's message"""
-    # This is a simple echo response - replace with your actual AI model integration
-    return f"You said: {message}"
+async def generate_response(message: str) -> str:
+    """Generate a response to the user's message, replaying cached answers to identical prompts"""
+    return await cached_generate(message)
 
-def save_chat_history(session_id: str, user_message: str, ai_response: str, db: Session):
-    """Save chat history to the database"""
+async def answer_message(message: str) -> str:
+    """Answer a chat message, reusing the answer to a near-identical earlier message if cached"""
+    if semantic_cache is None:
+        return await generate_response(message)
     try:
-        chat = ChatHistory(
+        vector = await semantic_cache.embed(message)
+    except Exception as e:
+        logger.warning(f"Semantic cache lookup skipped: {str(e)}")
+        return await generate_response(message)
+    hit = semantic_cache.lookup(vector)
+    if hit is not None:
+        logger.debug(f"Semantic cache hit ({hit.similarity:.3f}) for: {hit.message[:80]}")
+        return hit.response
+    response_text = await generate_response(message)
+    semantic_cache.add(vector, message, response_text)
+    return response_text
+
+async def stream_response(message: str) -> AsyncIterator[str]:
+    """Yield the response to the user's message token by token"""
+    async for token in get_provider().stream(message):
+        yield token
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode a payload as a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+async def save_chat_history(session_id: str, user_message: str, ai_response: str):
+    """Queue the exchange for the background chat history writer"""
+    try:
+        await history_writer.write(
             session_id=session_id,
             user_message=user_message,
-            ai_response=ai_response,
-            timestamp=datetime.utcnow()
+            ai_response=ai_response
         )
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
-        return chat
     except Exception as e:
-        db.rollback()
         logger.error(f"Error saving chat history: {str(e)}")
-        return None
 
 @router.post("/", response_model=ChatResponse)
-async def chat_with_ai(
-    chat_request: ChatRequest,
-    db: Session = Depends(get_db)
-):
+async def chat_with_ai(chat_request: ChatRequest):
     """
     Chat with the AI assistant.
     
@@ -74,18 +132,16 @@ async def chat_with_ai(
     """
     try:
         # Get or create session
-        session_id = get_or_create_session(chat_request.session_id)
-        sessions[session_id]["last_activity"] = datetime.utcnow()
+        session_id = await get_or_create_session(chat_request.session_id)
         
         # Generate response
-        response_text = generate_response(chat_request.message)
+        response_text = await answer_message(chat_request.message)
         
         # Save to chat history
-        save_chat_history(
+        await save_chat_history(
             session_id=session_id,
             user_message=chat_request.message,
-            ai_response=response_text,
-            db=db
+            ai_response=response_text
         )
         
         return {
@@ -105,5 +161,68 @@ async def chat_with_ai(
             "context": {"error": str(e)[:200], "fallback": True}
         }
 
+@router.get("/sessions/stats")
+async def session_stats():
+    """Session store size, hit/miss and eviction counters"""
+    return await session_store.stats()
+
+@router.get("/history/stats")
+async def history_stats():
+    """Chat history writer queue depth and batch counters"""
+    return history_writer.stats()
+
+@router.get("/llm-cache/stats")
+async def llm_cache_stats():
+    """LLM response cache size and per-tier hit/miss counters"""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+@router.get("/coalescing/stats")
+async def coalescing_stats():
+    """Generations in flight and how many requests joined one instead of calling the model"""
+    return in_flight.stats()
+
+@router.get("/semantic-cache/stats")
+async def semantic_cache_stats():
+    """Semantic cache size, hit ratio and recent best-match similarities"""
+    return semantic_cache.stats() if semantic_cache is not None else {"enabled": False}
+
+@router.post("/stream")
+async def stream_chat_with_ai(chat_request: ChatRequest):
+    """
+    Chat with the AI assistant, streaming the response as Server-Sent Events.
+
+    Each token is sent as a ``data`` frame as soon as the model yields it;
+    a final ``done`` event carries the session id. The chat history row is
+    written once the stream has closed.
+    """
+    session_id = await get_or_create_session(chat_request.session_id)
+
+    async def event_stream():
+        tokens = []
+        try:
+            async for token in stream_response(chat_request.message):
+                tokens.append(token)
+                yield format_sse({"token": token})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
+            yield format_sse({"error": str(e)[:200]}, event="error")
+            return
+
+        response_text = "".join(tokens)
+        yield format_sse({"session_id": session_id, "context": chat_request.context or {}}, event="done")
+
+        await save_chat_history(
+            session_id=session_id,
+            user_message=chat_request.message,
+            ai_response=response_text
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Export the router
 __all__ = ["router"]
@@ -0,0 +1,128 @@
+"""
+Semantic cache of chat answers.
+
+Users rephrase the same question, which the exact-match response cache
+never sees as a repeat. ``SemanticCache`` keeps the embeddings of recently
+answered messages in one preallocated matrix; a lookup is a single
+matrix-vector product, and a message whose cosine similarity to a stored
+one reaches ``threshold`` gets the stored answer back. Entries expire after
+``ttl`` seconds and the oldest entry is overwritten once the cache is full.
+"""
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from knowledge.index import normalize
+from llm.embeddings import EmbeddingProvider, get_embedding_provider
+
+logger = logging.getLogger(__name__)
+
+# Best similarities of this many recent lookups are kept for threshold tuning
+SIMILARITY_WINDOW = 1000
+
+
+@dataclass
+class SemanticHit:
+    message: str
+    response: str
+    similarity: float
+
+
+class SemanticCache:
+    """Bounded, TTL-limited nearest-neighbour cache of (message, answer) pairs"""
+
+    def __init__(
+        self,
+        provider: Optional[EmbeddingProvider] = None,
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1]: {threshold}")
+        self._provider = provider
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        # Insertion time per slot; -inf marks a slot that was never used
+        self._created = np.full(max_entries, -np.inf)
+        self._messages: List[Optional[str]] = [None] * max_entries
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._similarities = deque(maxlen=SIMILARITY_WINDOW)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def provider(self) -> EmbeddingProvider:
+        return self._provider or get_embedding_provider()
+
+    async def embed(self, message: str) -> np.ndarray:
+        return normalize(np.asarray(await self.provider.embed([message]), dtype=np.float32))[0]
+
+    def _live(self, now: float) -> np.ndarray:
+        return self._created > now - self.ttl
+
+    def lookup(self, vector: np.ndarray) -> Optional[SemanticHit]:
+        """The stored answer closest to ``vector`` if it clears the threshold"""
+        live = self._live(time.monotonic())
+        if self._vectors is None or self._vectors.shape[1] != len(vector) or not live.any():
+            self.misses += 1
+            return None
+        similarities = self._vectors @ vector
+        similarities[~live] = -np.inf
+        slot = int(np.argmax(similarities))
+        similarity = float(similarities[slot])
+        self._similarities.append(similarity)
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return SemanticHit(self._messages[slot], self._responses[slot], similarity)
+
+    def add(self, vector: np.ndarray, message: str, response: str) -> None:
+        if self._vectors is None or self._vectors.shape[1] != len(vector):
+            # First entry, or the embedding model changed: start over
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            self._created[:] = -np.inf
+        now = time.monotonic()
+        # Never-used slots sort first, then expired ones, then the oldest live entry
+        slot = int(np.argmin(self._created))
+        if self._live(now)[slot]:
+            self.evictions += 1
+        self._vectors[slot] = vector
+        self._created[slot] = now
+        self._messages[slot] = message
+        self._responses[slot] = response
+
+    def clear(self) -> None:
+        self._vectors = None
+        self._created[:] = -np.inf
+        self._messages = [None] * self.max_entries
+        self._responses = [None] * self.max_entries
+
+    def __len__(self) -> int:
+        return int(self._live(time.monotonic()).sum())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        similarities = np.asarray(self._similarities)
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            # Where recent best matches fall, to pick a threshold for this deployment's traffic
+            "best_similarity_quantiles": {
+                f"p{q}": float(np.percentile(similarities, q)) for q in (50, 90, 99)
+            } if len(similarities) else {},
+        }
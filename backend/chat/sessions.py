@@ -0,0 +1,305 @@
+"""
+Bounded chat session store.
+
+Sessions are kept in an LRU that also expires entries after an idle TTL, so
+a long-running worker no longer accumulates every session it has ever seen.
+Storage sits behind ``SessionBackend`` so it can be moved out of process.
+The backend API is async: in-process lookups complete inline, while
+backends that do blocking I/O run it in a worker thread so a busy shared
+store never stalls the event loop.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from database.sqlite import SharedSQLiteFile
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBackend(ABC):
+    """Storage interface used by ``SessionStore``"""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the session and mark it as used, or ``None`` if unknown/expired"""
+
+    @abstractmethod
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Insert or replace a session"""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        """Remove a session if present"""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Drop idle sessions and return how many were removed"""
+
+    @abstractmethod
+    async def size(self) -> int:
+        """Number of sessions currently held"""
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "size": await self.size()}
+
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    LRU + idle-TTL session storage local to this process.
+
+    With ``refresh_on_read=False`` the TTL counts from insertion instead of
+    last use, which is what an L1 cache in front of a shared backend needs.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 1800.0, refresh_on_read: bool = True):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.refresh_on_read = refresh_on_read
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, last_seen: float, now: float) -> bool:
+        return self.idle_ttl > 0 and now - last_seen > self.idle_ttl
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            data, last_seen = entry
+            if self._expired(last_seen, now):
+                del self._entries[session_id]
+                self.expirations += 1
+                return None
+            if self.refresh_on_read:
+                self._entries[session_id] = (data, now)
+            self._entries.move_to_end(session_id)
+            return data
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[session_id] = (data, time.monotonic())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    async def sweep(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            if self.refresh_on_read:
+                # Entries are kept in last-used order, so expired ones are at the front
+                while self._entries:
+                    session_id, (_, last_seen) = next(iter(self._entries.items()))
+                    if not self._expired(last_seen, now):
+                        break
+                    del self._entries[session_id]
+                    removed += 1
+            else:
+                expired = [key for key, (_, stored) in self._entries.items() if self._expired(stored, now)]
+                for session_id in expired:
+                    del self._entries[session_id]
+                removed = len(expired)
+            self.expirations += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def size(self) -> int:
+        return len(self._entries)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            **await super().stats(),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def _encode(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=lambda value: {"__datetime__": value.isoformat()})
+
+
+def _decode(raw: str) -> Dict[str, Any]:
+    def hook(obj):
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        return obj
+    return json.loads(raw, object_hook=hook)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Session storage in a WAL-mode SQLite file shared by every worker process.
+
+    WAL lets readers in other workers proceed while one worker writes, and
+    ``synchronous=NORMAL`` avoids an fsync on every session touch. Queries
+    run in a worker thread (see ``SharedSQLiteFile``).
+    """
+
+    def __init__(self, path: str, idle_ttl: float = 1800.0):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.db = SharedSQLiteFile(path, schema=[
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_chat_sessions_last_seen ON chat_sessions (last_seen)",
+        ])
+        self.expirations = 0
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        # Wall-clock time: monotonic clocks are not comparable across processes
+        now = time.time()
+        row = await self.db.fetchone(
+            "UPDATE chat_sessions SET last_seen = ? WHERE session_id = ? AND last_seen >= ? RETURNING data",
+            (now, session_id, now - self.idle_ttl),
+        )
+        return _decode(row[0]) if row else None
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        await self.db.execute(
+            "INSERT OR REPLACE INTO chat_sessions (session_id, data, last_seen) VALUES (?, ?, ?)",
+            (session_id, _encode(data), time.time()),
+        )
+
+    async def delete(self, session_id: str) -> None:
+        await self.db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    async def sweep(self) -> int:
+        removed = await self.db.execute("DELETE FROM chat_sessions WHERE last_seen < ?", (time.time() - self.idle_ttl,))
+        self.expirations += removed
+        return removed
+
+    async def size(self) -> int:
+        return (await self.db.fetchone("SELECT COUNT(*) FROM chat_sessions"))[0]
+
+    async def stats(self) -> Dict[str, Any]:
+        return {**await super().stats(), "path": self.path, "idle_ttl_seconds": self.idle_ttl, "expirations": self.expirations}
+
+
+class TieredSessionBackend(SessionBackend):
+    """
+    In-process L1 cache in front of a shared L2 backend.
+
+    L1 entries expire a fixed time after they were loaded, so an active
+    session re-reads L2 (refreshing its shared idle timer) at least once per
+    L1 TTL while most lookups never leave the process.
+    """
+
+    def __init__(self, l1: InMemorySessionBackend, l2: SessionBackend):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_hits = 0
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.l1.get(session_id)
+        if data is not None:
+            self.l1_hits += 1
+            return data
+        data = await self.l2.get(session_id)
+        if data is not None:
+            await self.l1.set(session_id, data)
+        return data
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        await self.l2.set(session_id, data)
+        await self.l1.set(session_id, data)
+
+    async def delete(self, session_id: str) -> None:
+        await self.l1.delete(session_id)
+        await self.l2.delete(session_id)
+
+    async def sweep(self) -> int:
+        await self.l1.sweep()
+        return await self.l2.sweep()
+
+    async def size(self) -> int:
+        return await self.l2.size()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            **await super().stats(),
+            "l1_hits": self.l1_hits,
+            "l1": await self.l1.stats(),
+            "l2": await self.l2.stats(),
+        }
+
+
+class SessionStore:
+    """Chat session lookup with hit/miss accounting and a background sweeper"""
+
+    def __init__(self, backend: SessionBackend, sweep_interval: float = 60.0):
+        self.backend = backend
+        self.sweep_interval = sweep_interval
+        self.hits = 0
+        self.misses = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def get_or_create(self, session_id: Optional[str] = None) -> str:
+        """Return ``session_id`` if it is live, otherwise start a new session"""
+        now = datetime.utcnow()
+        if session_id:
+            data = await self.backend.get(session_id)
+            if data is not None:
+                self.hits += 1
+                data["last_activity"] = now
+                return session_id
+        self.misses += 1
+        session_id = str(uuid.uuid4())
+        await self.backend.set(session_id, {"created_at": now, "last_activity": now})
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(session_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            **await self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.backend.sweep()
+                if removed:
+                    logger.debug(f"Session sweeper removed {removed} idle sessions")
+            except Exception as e:
+                logger.error(f"Session sweep failed: {str(e)}")
+
+    def start_sweeper(self) -> None:
+        """Start the periodic sweep on the running event loop"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
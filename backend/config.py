@@ -6,9 +6,26 @@ env_path = Path(__file__).parent / '.env'
 load_dotenv(env_path, override=True)
 
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
+# Fall back to the bundled SQLite file when no server database is configured
+DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{Path(__file__).parent / 'db' / 'genaistack.db'}"
+
+# Connection pool (applies to both the sync and the async engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite tuning profile ("balanced", "durable" or "default"); the SQLITE_* values override single pragmas
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced")
+SQLITE_PRAGMA_OVERRIDES = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE"),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS"),
+}
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -16,3 +33,82 @@ if not SECRET_KEY:
 
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+# LLM provider ("fake" echoes the prompt deterministically; "gemini" calls the Gemini API)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "fake")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+# Exact-match response cache: per-process LRU in front of a SQLite file shared by workers
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH")  # defaults to backend/db/llm_cache.db
+# Retrieved context an LLM node may put in its prompt (nodes override it with "contextTokens")
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "3000"))
+# tiktoken encoding used for token counts when tiktoken is installed; empty means always estimate
+LLM_TOKENIZER_ENCODING = os.getenv("LLM_TOKENIZER_ENCODING", "cl100k_base")
+# Concurrent identical generations share one provider call
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+# Semantic chat cache: reuse the answer to an earlier message at least this similar (cosine)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+# Chat sessions
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+# "memory" keeps sessions per process; "sqlite" shares them across uvicorn workers
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")
+SESSION_L1_TTL_SECONDS = float(os.getenv("SESSION_L1_TTL_SECONDS", "30"))
+
+# Chat history writer ("buffered" returns before the row is committed; "durable" waits for the batch commit)
+CHAT_HISTORY_DURABILITY = os.getenv("CHAT_HISTORY_DURABILITY", "buffered")
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "100"))
+CHAT_HISTORY_FLUSH_INTERVAL_SECONDS = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL_SECONDS", "0.05"))
+
+# Logging ("production" logs JSON through a non-blocking queue handler)
+LOG_MODE = os.getenv("LOG_MODE", "development")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module levels, e.g. "chat=DEBUG,uvicorn.access=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+
+# Knowledge base ingestion
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR")  # defaults to backend/db/knowledge
+KNOWLEDGE_CHUNK_SIZE = int(os.getenv("KNOWLEDGE_CHUNK_SIZE", "1000"))
+KNOWLEDGE_CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "200"))
+
+# Embeddings ("fake" hashes words locally; "openai" calls the embeddings API)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "fake")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0")) or None
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Concurrent embed calls are coalesced into batches of up to this many texts (1 disables batching)
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "256"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+# Knowledge base retrieval
+KNOWLEDGE_EMBED_BATCH_SIZE = int(os.getenv("KNOWLEDGE_EMBED_BATCH_SIZE", "64"))
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "5"))
+# Documents with at least this many chunks also get an IVF index
+KNOWLEDGE_ANN_MIN_CHUNKS = int(os.getenv("KNOWLEDGE_ANN_MIN_CHUNKS", "100000"))
+KNOWLEDGE_ANN_NPROBE = int(os.getenv("KNOWLEDGE_ANN_NPROBE", "16"))
+# Hybrid retrieval: reciprocal rank fusion of vector and BM25 rankings
+# (KnowledgeBase nodes can override the weights with vectorWeight / keywordWeight)
+KNOWLEDGE_VECTOR_WEIGHT = float(os.getenv("KNOWLEDGE_VECTOR_WEIGHT", "1.0"))
+KNOWLEDGE_KEYWORD_WEIGHT = float(os.getenv("KNOWLEDGE_KEYWORD_WEIGHT", "1.0"))
+KNOWLEDGE_RRF_K = int(os.getenv("KNOWLEDGE_RRF_K", "60"))
+KNOWLEDGE_HYBRID_DEPTH_FACTOR = int(os.getenv("KNOWLEDGE_HYBRID_DEPTH_FACTOR", "4"))
+# Re-uploads add segments and tombstones; compact once either grows past these
+KNOWLEDGE_COMPACTION_RATIO = float(os.getenv("KNOWLEDGE_COMPACTION_RATIO", "0.2"))
+KNOWLEDGE_MAX_SEGMENTS = int(os.getenv("KNOWLEDGE_MAX_SEGMENTS", "8"))
+
+# Workflows: compiled plans kept per worker, keyed by graph content
+WORKFLOW_PLAN_CACHE_SIZE = int(os.getenv("WORKFLOW_PLAN_CACHE_SIZE", "256"))
+# Node outputs memoized per worker so re-runs only execute edited nodes and their dependents
+WORKFLOW_MEMO_MAX_ENTRIES = int(os.getenv("WORKFLOW_MEMO_MAX_ENTRIES", "1024"))
@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+# Point every on-disk store at a scratch directory before the app modules
+# read their config, so test runs never write into backend/db/
+_scratch = tempfile.mkdtemp(prefix="genaistack-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/genaistack.db")
+os.environ.setdefault("KNOWLEDGE_DIR", os.path.join(_scratch, "knowledge"))
+os.environ.setdefault("LLM_CACHE_DB_PATH", os.path.join(_scratch, "llm_cache.db"))
+os.environ.setdefault("SESSION_DB_PATH", os.path.join(_scratch, "sessions.db"))
+
+import pytest
+
+from llm.cache import ResponseCache, set_response_cache
+
+
+@pytest.fixture(autouse=True)
+def memory_response_cache():
+    """Give every test a fresh in-memory LLM cache"""
+    set_response_cache(ResponseCache(None))
+    yield
+    set_response_cache(None)
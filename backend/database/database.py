@@ -1,10 +1,18 @@
 import os
 import sys
+import logging
 from pathlib import Path
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+import config
+from database.pool import TimedQueuePool, TimedAsyncQueuePool, pool_stats
+from database.sqlite import resolve_pragmas, apply_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
 # Get the absolute path to the backend directory
 BACKEND_DIR = Path(__file__).parent.parent.absolute()
 
@@ -13,28 +21,68 @@ DB_DIR = BACKEND_DIR / 'db'
 os.makedirs(DB_DIR, exist_ok=True)  # Ensure the directory exists
 
 DB_FILE = DB_DIR / 'genaistack.db'
-DATABASE_URL = f"sqlite:///{DB_FILE}"
-
-# Print database configuration for debugging
-print("=== Database Configuration ===")
-print(f"Backend directory: {BACKEND_DIR}")
-print(f"Database directory: {DB_DIR}")
-print(f"Database file: {DB_FILE}")
-print(f"Database URL: {DATABASE_URL}")
-print(f"Directory exists: {os.path.exists(DB_DIR)}")
-print(f"Directory is writable: {os.access(DB_DIR, os.W_OK) if os.path.exists(DB_DIR) else 'N/A'}")
-print(f"Database file exists: {os.path.exists(DB_FILE)}")
+DATABASE_URL = config.DATABASE_URL
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Log database configuration for debugging
+logger.debug(f"Backend directory: {BACKEND_DIR}")
+logger.debug(f"Database directory: {DB_DIR}")
+logger.debug(f"Database URL: {DATABASE_URL}")
+logger.debug(f"Directory is writable: {os.access(DB_DIR, os.W_OK)}")
+
+def pool_options() -> dict:
+    """Pool sizing shared by the sync and async engines"""
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
 
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=True  # Enable SQL query logging
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    poolclass=TimedQueuePool,
+    echo=config.SQL_ECHO,  # SQL query logging, off unless explicitly enabled
+    **pool_options()
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql+psycopg2:"):
+        return "postgresql+asyncpg:" + url[len("postgresql+psycopg2:"):]
+    if url.startswith(("postgresql:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+# Async engine for the FastAPI routes, so queries never block the event loop
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    echo=config.SQL_ECHO,
+    **pool_options()
+)
+
+if IS_SQLITE:
+    sqlite_pragmas = resolve_pragmas(config.SQLITE_PROFILE, config.SQLITE_PRAGMA_OVERRIDES)
+    apply_sqlite_pragmas(engine, sqlite_pragmas)
+    apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas)
+
+# Create async session factory
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -44,4 +92,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_stats() -> dict:
+    """Live statistics for both connection pools"""
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.sync_engine.pool),
+    }
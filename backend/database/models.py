@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, func, Text
+from sqlalchemy import Column, Integer, String, DateTime, func, Text, BigInteger, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from .database import engine
 
@@ -15,4 +15,67 @@ class ChatHistory(Base):
     timestamp = Column(DateTime, server_default=func.now())
     
     def __repr__(self):
-        return f"<ChatHistory {self.id} - Session {self.session_id}>"
\ No newline at end of file
+        return f"<ChatHistory {self.id} - Session {self.session_id}>"
+
+class KnowledgeDocument(Base):
+    __tablename__ = "knowledge_documents"
+
+    id = Column(String, primary_key=True)  # UUID returned by /knowledge/upload
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    content_hash = Column(String, index=True, nullable=False)  # SHA-256 of the uploaded bytes
+    size_bytes = Column(BigInteger, nullable=False)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    chunk_size = Column(Integer, nullable=False)
+    chunk_overlap = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped by every re-upload
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<KnowledgeDocument {self.id} - {self.filename}>"
+
+class KnowledgeChunk(Base):
+    __tablename__ = "knowledge_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(String, ForeignKey("knowledge_documents.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Order of the chunk within the document
+    start_offset = Column(Integer, nullable=False)  # Character offset of the chunk in the extracted text
+    text = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the normalized text, used to diff versions
+    version_added = Column(Integer, nullable=False, default=1, server_default="1")
+    version_removed = Column(Integer, nullable=True)  # Tombstone: set when a later version dropped the chunk
+
+    __table_args__ = (Index("ix_knowledge_chunks_document_position", "document_id", "position"),)
+
+    def __repr__(self):
+        return f"<KnowledgeChunk {self.document_id}#{self.position}>"
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    model = Column(String, primary_key=True)  # "<model>:<dim>" of the provider that produced the vector
+    text_hash = Column(String(64), primary_key=True)  # SHA-256 of the normalized chunk text
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 bytes
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry {self.model} {self.text_hash[:12]}>"
+
+class Workflow(Base):
+    __tablename__ = "workflows"
+
+    id = Column(String, primary_key=True)  # Stack id from the editor, or a generated UUID
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    graph = Column(Text, nullable=False)  # Compact JSON {"nodes": [...], "edges": [...]} without UI-only fields
+    etag = Column(String(34), nullable=False)  # Quoted content hash of name, description and graph
+    version = Column(Integer, nullable=False, default=1)  # Bumped by every save that changes the content
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("ix_workflows_updated_at", "updated_at"),)
+
+    def __repr__(self):
+        return f"<Workflow {self.id} - {self.name}>"
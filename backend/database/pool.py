@@ -0,0 +1,86 @@
+"""
+Connection pools that record how long callers wait for a connection.
+
+The wait time covers everything ``pool.connect()`` does before handing a
+connection over: queueing for a free slot, opening an overflow connection
+and the pre-ping. Together with the live checked-out/overflow counts this
+shows whether latency spikes under load come from pool starvation.
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolTimings:
+    """Counters shared by a pool and every pool recreated from it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.peak_overflow = 0
+
+    def record(self, wait_ms: float, overflow: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+class _TimedPoolMixin:
+    timings: PoolTimings
+
+    def connect(self):
+        if not hasattr(self, "timings"):
+            self.timings = PoolTimings()
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timings.record_timeout()
+            raise
+        self.timings.record((time.perf_counter() - started) * 1000, max(self.overflow(), 0))
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep the counters running
+        pool = super().recreate()
+        pool.timings = getattr(self, "timings", PoolTimings())
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """QueuePool that records checkout wait times"""
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times"""
+
+
+def pool_stats(pool: Any) -> Dict[str, Any]:
+    """Live pool usage plus the recorded wait-time counters"""
+    timings = getattr(pool, "timings", None) or PoolTimings()
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+        "checkouts": timings.checkouts,
+        "timeouts": timings.timeouts,
+        "avg_wait_ms": timings.total_wait_ms / timings.checkouts if timings.checkouts else 0.0,
+        "max_wait_ms": timings.max_wait_ms,
+        "peak_overflow": timings.peak_overflow,
+    }
@@ -0,0 +1,96 @@
+"""
+SQLite tuning profiles applied to every new connection.
+
+``balanced`` (the default) switches to WAL so readers no longer block on
+writers, and relaxes ``synchronous`` to NORMAL, which in WAL mode only
+fsyncs at checkpoints instead of on every commit. ``durable`` keeps WAL but
+fsyncs each commit; ``default`` leaves SQLite's own settings untouched.
+
+``SharedSQLiteFile`` is the small raw-``sqlite3`` store used by the session
+backend and the LLM response cache: one WAL-mode file shared by every
+worker, whose queries run in a worker thread because a writer may wait up
+to the busy timeout for another worker's write lock.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # negative values are KiB: 64 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+
+def resolve_pragmas(profile: str, overrides: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Return the pragmas for ``profile`` with any non-empty overrides applied"""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name, value in (overrides or {}).items():
+        if value not in (None, ""):
+            pragmas[name] = value
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas: Dict[str, object]) -> None:
+    """Run ``PRAGMA name=value`` for each entry whenever ``engine`` opens a connection"""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.info(f"SQLite pragmas: {pragmas}")
+
+
+class SharedSQLiteFile:
+    """A WAL-mode SQLite connection whose queries are run off the event loop"""
+
+    def __init__(self, path: str, schema: Iterable[str] = (), timeout: float = 30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in schema:
+            self._conn.execute(statement)
+
+    def _fetchone(self, sql: str, params: Tuple[Any, ...]) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _execute(self, sql: str, params: Tuple[Any, ...]) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    async def fetchone(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[Tuple[Any, ...]]:
+        """First row of a query (``UPDATE ... RETURNING`` included), read in a worker thread"""
+        return await asyncio.to_thread(self._fetchone, sql, params)
+
+    async def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> int:
+        """Run a write in a worker thread and return the number of rows it changed"""
+        return await asyncio.to_thread(self._execute, sql, params)
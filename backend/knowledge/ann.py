@@ -0,0 +1,181 @@
+"""
+Approximate nearest-neighbour index (IVF-Flat) for large knowledge bases.
+
+Vectors are partitioned into ``nlist`` clusters by spherical k-means; a
+query is only scored against the ``nprobe`` clusters whose centroids are
+closest to it. ``nprobe`` is the recall/latency knob: 1 is fastest,
+``nlist`` is equivalent to an exact search.
+
+Vectors added before the index is trained are kept in a flat buffer and
+searched exactly; once ``train_size`` vectors are buffered (or ``train`` is
+called) the centroids are fitted and the buffer is distributed to clusters.
+Later additions are assigned to their nearest centroid incrementally.
+"""
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from knowledge.index import VectorIndex, normalize, top_k
+
+INDEX_FORMAT_VERSION = 1
+
+
+def spherical_kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Fit ``clusters`` unit-length centroids to unit-length ``vectors``"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=clusters)
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty clusters with random points so every list gets used
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    """Index of the closest centroid for each vector"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        assignment[start:start + block_rows] = np.argmax(vectors[start:start + block_rows] @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Inverted-file index with exact scoring inside the probed clusters"""
+
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16, train_size: Optional[int] = None):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # Roughly 40 points per centroid gives stable k-means fits
+        self.train_size = train_size or nlist * 40
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[VectorIndex] = []
+        self.pending = VectorIndex(dim)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self.pending) + sum(len(inverted) for inverted in self.lists)
+
+    def train(self, sample: Optional[np.ndarray] = None, iterations: int = 10) -> None:
+        """Fit the centroids (on ``sample`` or the buffered vectors) and distribute the buffer"""
+        sample = normalize(sample) if sample is not None else self.pending.vectors
+        if len(sample) < self.nlist:
+            raise ValueError(f"Need at least {self.nlist} vectors to train {self.nlist} clusters")
+        if len(sample) > self.train_size:
+            sample = sample[np.random.default_rng(0).choice(len(sample), size=self.train_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, self.nlist, iterations)
+        self.lists = [VectorIndex(self.dim, capacity=16) for _ in range(self.nlist)]
+        buffered_ids, buffered = self.pending.ids.copy(), self.pending.vectors.copy()
+        self.pending = VectorIndex(self.dim)
+        if len(buffered):
+            self._distribute(buffered_ids, buffered)
+
+    def _distribute(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        assignment = assign(vectors, self.centroids)
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.searchsorted(assignment[order], np.arange(self.nlist + 1))
+        for cluster in range(self.nlist):
+            rows = order[boundaries[cluster]:boundaries[cluster + 1]]
+            if len(rows):
+                self.lists[cluster].add(ids[rows], vectors[rows])
+
+    def add(self, ids, vectors) -> None:
+        """Insert vectors; trains automatically once enough are buffered"""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        vectors = normalize(vectors)
+        if self.is_trained:
+            self._distribute(ids, vectors)
+            return
+        self.pending.add(ids, vectors)
+        if len(self.pending) >= self.train_size:
+            self.train()
+
+    def search_batch(self, queries, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k ids and cosine scores for each query"""
+        queries = normalize(queries)
+        if not self.is_trained:
+            return self.pending.search_batch(queries, k)
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes, _ = top_k(queries @ self.centroids.T, nprobe)
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, clusters in enumerate(probes):
+            candidates = [self.lists[cluster] for cluster in clusters if len(self.lists[cluster])]
+            if not candidates:
+                continue
+            # Score each probed list in place rather than copying them together
+            scores = np.concatenate([inverted.vectors @ queries[row] for inverted in candidates])
+            ids = np.concatenate([inverted.ids for inverted in candidates])
+            columns, scores = top_k(scores[None, :], k)
+            result_ids[row, :columns.shape[1]] = ids[columns[0]]
+            result_scores[row, :columns.shape[1]] = scores[0]
+        found = min(k, len(self))
+        return result_ids[:, :found], result_scores[:, :found]
+
+    def search(self, query, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        ids, scores = self.search_batch(np.asarray(query)[None, :], k, nprobe)
+        return ids[0], scores[0]
+
+    def save(self, directory) -> None:
+        """Write the index as .npy files plus a small JSON header"""
+        directory = Path(directory)
+        os.makedirs(directory, exist_ok=True)
+        lists = self.lists if self.is_trained else []
+        sizes = np.array([len(inverted) for inverted in lists], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        vectors = np.concatenate([inverted.vectors for inverted in lists]) if lists else np.zeros((0, self.dim), np.float32)
+        ids = np.concatenate([inverted.ids for inverted in lists]) if lists else np.zeros(0, np.int64)
+
+        np.save(directory / "vectors.npy", vectors)
+        np.save(directory / "ids.npy", ids)
+        np.save(directory / "offsets.npy", offsets)
+        np.save(directory / "pending_vectors.npy", self.pending.vectors)
+        np.save(directory / "pending_ids.npy", self.pending.ids)
+        if self.is_trained:
+            np.save(directory / "centroids.npy", self.centroids)
+        with open(directory / "index.json", "w") as header:
+            json.dump({
+                "version": INDEX_FORMAT_VERSION,
+                "dim": self.dim,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "train_size": self.train_size,
+                "trained": self.is_trained,
+            }, header)
+
+    @classmethod
+    def load(cls, directory) -> "IVFIndex":
+        """Read an index written by ``save``"""
+        directory = Path(directory)
+        with open(directory / "index.json") as header:
+            meta = json.load(header)
+        if meta["version"] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported IVF index version: {meta['version']}")
+        index = cls(meta["dim"], nlist=meta["nlist"], nprobe=meta["nprobe"], train_size=meta["train_size"])
+        pending_ids = np.load(directory / "pending_ids.npy")
+        if len(pending_ids):
+            index.pending.add(pending_ids, np.load(directory / "pending_vectors.npy"))
+        if meta["trained"]:
+            index.centroids = np.load(directory / "centroids.npy")
+            vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+            offsets = np.load(directory / "offsets.npy")
+            ids = np.load(directory / "ids.npy", mmap_mode="r")
+            # Lists are views into the mapped files until something is added to them
+            index.lists = [
+                VectorIndex.from_arrays(ids[offsets[cluster]:offsets[cluster + 1]], vectors[offsets[cluster]:offsets[cluster + 1]])
+                for cluster in range(index.nlist)
+            ]
+        return index
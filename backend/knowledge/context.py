@@ -0,0 +1,131 @@
+"""
+Token-budget context packing for LLM prompts.
+
+``pack_context`` fills a token budget with retrieved chunks, best score
+first. Neighbouring chunks of a document overlap by ``chunk_overlap``
+characters, so only the part of a chunk not already covered by a chosen
+chunk is added (and costs tokens); chunks that are fully covered are
+dropped. The chosen pieces are then laid out in document order, with
+adjacent pieces joined back into continuous text.
+
+Token counts come from tiktoken when it is installed, otherwise from a
+regex estimate (about one token per four word characters or per
+punctuation mark). Either way counts are cached per text, since the same
+chunks are packed run after run.
+"""
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import config
+
+try:
+    import tiktoken
+except ImportError:  # exact token counts are optional
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+ESTIMATE_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+TOKEN_COUNT_CACHE_SIZE = 8192
+
+
+class RetrievedContext(str):
+    """Joined chunk text that also carries the chunks, so an LLM node can repack them"""
+
+    chunks: Sequence[Any]
+
+    def __new__(cls, text: str, chunks: Sequence[Any]):
+        value = super().__new__(cls, text)
+        value.chunks = chunks
+        return value
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    chunks_used: int
+    chunks_skipped: int  # did not fit in the remaining budget
+    chunks_deduplicated: int  # already covered by higher-scoring chunks
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None or not config.LLM_TOKENIZER_ENCODING:
+        return None
+    try:
+        return tiktoken.get_encoding(config.LLM_TOKENIZER_ENCODING)
+    except Exception as e:
+        # The encoding files are downloaded on first use, which fails offline
+        logger.warning(f"Falling back to estimated token counts: {str(e)}")
+        return None
+
+
+def count_tokens_uncached(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(ESTIMATE_PATTERN.findall(text))
+
+
+# Chunk texts repeat across runs; one-off strings such as rendered prompts are counted uncached
+count_tokens = lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)(count_tokens_uncached)
+
+
+def _uncovered(start: int, end: int, covered: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Parts of ``[start, end)`` not inside any of the ``covered`` spans"""
+    segments = []
+    position = start
+    for span_start, span_end in sorted(covered):
+        if span_end <= position:
+            continue
+        if span_start >= end:
+            break
+        if span_start > position:
+            segments.append((position, span_start))
+        position = max(position, span_end)
+    if position < end:
+        segments.append((position, end))
+    return segments
+
+
+def pack_context(chunks: Sequence[Any], budget: int, separator: str = "\n\n") -> PackedContext:
+    """
+    Best-scoring chunks that fit in ``budget`` tokens, without overlap.
+
+    ``chunks`` need ``document_id``, ``start_offset``, ``text`` and
+    ``score`` attributes (``RetrievedChunk``).
+    """
+    covered: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    pieces: List[Tuple[str, int, str]] = []
+    used = skipped = deduplicated = chosen = 0
+    for chunk in sorted(chunks, key=lambda chunk: chunk.score, reverse=True):
+        start = chunk.start_offset
+        segments = _uncovered(start, start + len(chunk.text), covered[chunk.document_id])
+        if not segments:
+            deduplicated += 1
+            continue
+        texts = [(offset, chunk.text[offset - start:end - start]) for offset, end in segments]
+        cost = sum(count_tokens(text) for _, text in texts)
+        if used + cost > budget:
+            skipped += 1
+            continue
+        used += cost
+        chosen += 1
+        covered[chunk.document_id].extend(segments)
+        pieces.extend((chunk.document_id, offset, text) for offset, text in texts)
+
+    parts: List[str] = []
+    previous_end: Optional[Tuple[str, int]] = None
+    for document_id, offset, text in sorted(pieces):
+        if previous_end == (document_id, offset):
+            parts[-1] += text
+        else:
+            parts.append(text)
+        previous_end = (document_id, offset + len(text))
+    text = separator.join(part.strip() for part in parts)
+    return PackedContext(text, count_tokens_uncached(text), chosen, skipped, deduplicated)
@@ -0,0 +1,111 @@
+"""
+Persistent embedding cache keyed by (model, normalized chunk text hash).
+
+Re-uploading an edited document produces mostly the same chunks, so
+``EmbeddingCache.embed`` looks up a whole batch with one ``IN`` query,
+sends only the misses to the provider and stores the new vectors for next
+time. Chunk text is normalized (Unicode NFC, collapsed whitespace) before
+hashing so that re-flowed text still hits.
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from database.database import AsyncSessionLocal
+from database.models import EmbeddingCacheEntry
+from llm.embeddings import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def model_key(provider: EmbeddingProvider) -> str:
+    # The same model truncated to another dimension gives different vectors
+    return f"{provider.model}:{provider.dim}"
+
+
+def _insert_ignoring_duplicates(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(EmbeddingCacheEntry).on_conflict_do_nothing()
+
+
+class EmbeddingCache:
+    """Database-backed embedding cache with hit/miss counters"""
+
+    def __init__(self, session_factory: Callable[[], Any] = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+        self.provider_calls = 0
+
+    async def embed(self, provider: EmbeddingProvider, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """Embed ``texts`` through the cache; returns the vectors and the number of hits"""
+        if not texts:
+            return np.zeros((0, provider.dim), dtype=np.float32), 0
+        model = model_key(provider)
+        hashes = [text_hash(text) for text in texts]
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector)
+                .where(EmbeddingCacheEntry.model == model, EmbeddingCacheEntry.text_hash.in_(set(hashes)))
+            )
+            found: Dict[str, np.ndarray] = {
+                row.text_hash: np.frombuffer(row.vector, dtype=np.float32) for row in result
+            }
+
+        # Identical chunks within the batch are embedded once
+        missing: Dict[str, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        if missing:
+            # No session is held across the provider call, so slow embeddings cannot drain the pool
+            vectors = np.asarray(await provider.embed(list(missing.values())), dtype=np.float32)
+            self.provider_calls += 1
+            rows = []
+            for digest, vector in zip(missing, vectors):
+                found[digest] = vector
+                rows.append({"model": model, "text_hash": digest, "dim": provider.dim, "vector": vector.tobytes()})
+            await self._store(rows)
+
+        hits = sum(1 for digest in hashes if digest not in missing)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return np.stack([found[digest] for digest in hashes]), hits
+
+    async def _store(self, rows: List[Dict[str, Any]]) -> None:
+        async with self.session_factory() as db:
+            try:
+                await db.execute(_insert_ignoring_duplicates(db.bind.dialect.name), rows)
+                await db.commit()
+            except Exception as e:
+                # A failed write only costs a future re-embed
+                await db.rollback()
+                logger.warning(f"Could not store {len(rows)} embeddings in the cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "provider_calls": self.provider_calls,
+        }
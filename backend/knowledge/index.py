@@ -0,0 +1,152 @@
+"""
+Exact (brute-force) vector index for knowledge-base retrieval.
+
+Chunk embeddings are L2-normalised on insert and kept in one contiguous
+float32 matrix, so cosine similarity for a whole batch of queries is a
+single matrix product. Top-k selection uses ``argpartition`` (linear time)
+and only sorts the k survivors. The matrix is scored in row blocks to keep
+the temporary score buffer small on large indexes.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+SCORE_BLOCK_ROWS = 262144
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 row vectors scaled to unit length (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k largest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    columns = scores.shape[1]
+    if k < columns:
+        # Partition around the k-th largest without materialising ``-scores``
+        candidates = np.argpartition(scores, columns - k, axis=1)[:, columns - k:]
+    else:
+        candidates = np.broadcast_to(np.arange(columns), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class VectorIndex:
+    """Cosine-similarity index over a growable float32 matrix"""
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self._ids = np.zeros(max(capacity, 1), dtype=np.int64)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, vectors: np.ndarray) -> "VectorIndex":
+        """
+        Wrap existing unit vectors without copying them (e.g. a read-only memmap).
+
+        The first ``add`` copies the rows into a new growable buffer.
+        """
+        index = cls.__new__(cls)
+        index.dim = vectors.shape[1]
+        index._vectors = vectors
+        index._ids = ids
+        index._size = len(ids)
+        return index
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, len(self._vectors) * 2)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._ids = vectors, ids
+
+    def add(self, ids, vectors) -> None:
+        """Append embeddings for the given chunk ids"""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        vectors = normalize(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}, got {vectors.shape}")
+        self._reserve(len(ids))
+        self._vectors[self._size:self._size + len(ids)] = vectors
+        self._ids[self._size:self._size + len(ids)] = ids
+        self._size += len(ids)
+
+    def search_batch(self, queries, k: int = 5, block_rows: int = SCORE_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every query against every stored vector in one pass.
+
+        Returns ``(ids, scores)``, both shaped ``(len(queries), min(k, len(self)))``.
+        """
+        queries = normalize(queries)
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Expected queries of dimension {self.dim}, got {queries.shape[1]}")
+        return search_matrix(self.vectors, self.ids, queries, k, block_rows)
+
+    def search(self, query, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids and cosine scores for a single query"""
+        ids, scores = self.search_batch(np.asarray(query)[None, :], k)
+        return ids[0], scores[0]
+
+
+def search_matrix(
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    block_rows: int = SCORE_BLOCK_ROWS,
+    valid: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k over a matrix of unit vectors (also used for memory-mapped stores).
+
+    ``valid`` is an optional boolean mask of rows that may be returned.
+    """
+    k = min(k, len(vectors))
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    if k <= 0:
+        return best_ids, best_scores
+
+    for start in range(0, len(vectors), block_rows):
+        block = vectors[start:start + block_rows]
+        scores = queries @ block.T
+        if valid is not None:
+            scores[:, ~valid[start:start + block_rows]] = -np.inf
+        columns, block_scores = top_k(scores, k)
+        # Merge this block's winners with the running top-k
+        merged_ids = np.concatenate([best_ids, ids[start:start + block_rows][columns]], axis=1)
+        merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+        order, best_scores = top_k(merged_scores, k)
+        best_ids = np.take_along_axis(merged_ids, order, axis=1)
+
+    if valid is not None:
+        # Drop masked rows that only filled the result because too few were valid
+        keep = np.isfinite(best_scores).all(axis=0)
+        best_ids, best_scores = best_ids[:, keep], best_scores[:, keep]
+    return best_ids, best_scores
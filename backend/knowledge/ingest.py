@@ -0,0 +1,383 @@
+"""
+Knowledge-base ingestion pipeline.
+
+Uploads are copied to disk in fixed-size blocks, text is extracted
+incrementally (block by block for text files, page by page for PDFs) and
+cut into overlapping chunks by a streaming chunker, so no stage ever holds
+the whole document in memory. Chunks are written to the database in
+batches as they are produced.
+
+Re-uploads of an existing document go through ``reingest_file``, which
+diffs the new chunks against the stored ones by normalized-text hash: kept
+chunks keep their row (and so their embedding), new chunks are inserted
+and dropped chunks are tombstoned with the version that removed them. The
+new version is only staged; ``commit_version`` makes it current once its
+chunks have been indexed.
+"""
+import codecs
+import hashlib
+import logging
+import os
+import re
+import uuid
+import zlib
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+
+from database.database import SessionLocal
+from database.models import KnowledgeChunk, KnowledgeDocument
+from knowledge.embedding_cache import text_hash
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF support is optional
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+COPY_BLOCK_SIZE = 1024 * 1024
+INSERT_BATCH_SIZE = 500
+
+BREAK_PATTERN = re.compile(r"[ \n]")
+# Characters before a candidate break that decide whether it is chosen
+BREAK_CONTEXT = 8
+
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".csv", ".tsv", ".json", ".jsonl", ".log", ".html", ".htm", ".xml", ".rst"}
+
+
+class IngestionError(Exception):
+    """Raised when an upload cannot be ingested"""
+
+
+@dataclass
+class IngestedDocument:
+    document_id: str
+    filename: str
+    size_bytes: int
+    content_hash: str
+    chunk_count: int
+    version: int = 1
+    chunks_added: int = 0
+    chunks_removed: int = 0
+    removed_ids: List[int] = field(default_factory=list)
+    # Kept chunks whose position changed, applied by ``commit_version``
+    moves: List[dict] = field(default_factory=list)
+
+
+def save_upload(source: BinaryIO, destination: Path) -> Tuple[int, str]:
+    """Copy ``source`` to ``destination`` block by block, returning its size and SHA-256"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(destination, "wb") as out:
+        while True:
+            block = source.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+            size += len(block)
+    return size, digest.hexdigest()
+
+
+def iter_text_file(path: Path, encoding: str = "utf-8") -> Iterator[str]:
+    """Decode a text file block by block (multi-byte characters may span blocks)"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as source:
+        while True:
+            block = source.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_pdf(path: Path) -> Iterator[str]:
+    """Extract a PDF page by page"""
+    if PdfReader is None:
+        raise IngestionError("PDF support requires the 'pypdf' package")
+    reader = PdfReader(str(path))
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        if text:
+            yield text + "\n"
+
+
+def iter_document_text(path: Path, filename: str) -> Iterator[str]:
+    """Pick an incremental text extractor based on the file extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".pdf":
+        return iter_pdf(path)
+    if extension in TEXT_EXTENSIONS or not extension:
+        return iter_text_file(path)
+    raise IngestionError(f"Unsupported file type: {extension}")
+
+
+def _content_cut(buffer: str, min_cut: int, chunk_size: int) -> int:
+    """
+    Pick a cut among the breaks in ``buffer[min_cut:chunk_size]``.
+
+    The chosen break is the one whose preceding characters hash lowest, so
+    the choice depends on the text around it rather than on where the
+    window starts. After an edit the chunker therefore falls back onto the
+    same cut points as before within a chunk or two, and unchanged text
+    further down produces identical chunks.
+    """
+    best_cut, best_hash = chunk_size, None
+    for match in BREAK_PATTERN.finditer(buffer, min_cut, chunk_size):
+        at = match.start()
+        digest = zlib.crc32(buffer[max(at - BREAK_CONTEXT, 0):at + 1].encode("utf-8"))
+        if best_hash is None or digest <= best_hash:
+            best_cut, best_hash = at + 1, digest
+    return best_cut
+
+
+def chunk_text(segments: Iterable[str], chunk_size: int, overlap: int) -> Iterator[Tuple[int, str]]:
+    """
+    Cut a stream of text into chunks of at most ``chunk_size`` characters.
+
+    Consecutive chunks share ``overlap`` characters. Cuts fall on a space or
+    newline in the final third of a chunk, chosen by content so that words
+    are not split and chunk boundaries survive edits elsewhere in the text.
+    Yields ``(start_offset, text)`` pairs.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be between 0 and chunk_size")
+
+    buffer = ""
+    buffer_start = 0
+    # Never cut at or before the overlap, so every chunk moves the window forward.
+    # The cut window is kept wide (the last third) so that after an edit the
+    # windows of the old and new chunk sequences overlap and resync quickly.
+    min_cut = max(overlap + 1, chunk_size * 2 // 3)
+    for segment in segments:
+        buffer += segment
+        while len(buffer) >= chunk_size:
+            cut = _content_cut(buffer, min_cut, chunk_size)
+            yield buffer_start, buffer[:cut]
+            advance = cut - overlap
+            buffer = buffer[advance:]
+            buffer_start += advance
+    if buffer.strip() and (buffer_start == 0 or len(buffer) > overlap):
+        yield buffer_start, buffer
+
+
+def ingest_file(
+    path: Path,
+    filename: str,
+    content_type: Optional[str],
+    size_bytes: int,
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    document_id: Optional[str] = None,
+) -> IngestedDocument:
+    """Extract, chunk and store a saved upload (blocking; run it in a worker thread)"""
+    document_id = document_id or str(uuid.uuid4())
+    db = SessionLocal()
+    try:
+        document = KnowledgeDocument(
+            id=document_id,
+            filename=filename,
+            content_type=content_type,
+            content_hash=content_hash,
+            size_bytes=size_bytes,
+            chunk_count=0,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        db.add(document)
+        db.flush()
+
+        chunk_count = 0
+        batch: List[dict] = []
+        for start_offset, text in chunk_text(iter_document_text(path, filename), chunk_size, chunk_overlap):
+            batch.append({
+                "document_id": document_id,
+                "position": chunk_count,
+                "start_offset": start_offset,
+                "text": text,
+                "content_hash": text_hash(text),
+            })
+            chunk_count += 1
+            if len(batch) >= INSERT_BATCH_SIZE:
+                db.execute(KnowledgeChunk.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.execute(KnowledgeChunk.__table__.insert(), batch)
+
+        document.chunk_count = chunk_count
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Ingested {filename} as {document_id}: {size_bytes} bytes, {chunk_count} chunks")
+    return IngestedDocument(
+        document_id=document_id,
+        filename=filename,
+        size_bytes=size_bytes,
+        content_hash=content_hash,
+        chunk_count=chunk_count,
+        chunks_added=chunk_count,
+    )
+
+
+def reingest_file(
+    path: Path,
+    document_id: str,
+    filename: str,
+    content_type: Optional[str],
+    size_bytes: int,
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> IngestedDocument:
+    """
+    Stage a new version of a document as a chunk diff (blocking; run it in a worker thread).
+
+    Only the added chunks are written, tagged with the new version, which
+    stays pending until ``commit_version`` applies the moves and tombstones
+    and bumps the document row, or ``discard_version`` drops it again.
+    """
+    chunks = KnowledgeChunk.__table__
+    db = SessionLocal()
+    try:
+        document = db.get(KnowledgeDocument, document_id)
+        if document is None:
+            raise IngestionError(f"Unknown document: {document_id}")
+        version = document.version + 1
+        # Rows left behind by a staged version that was never committed
+        db.execute(chunks.delete().where(chunks.c.document_id == document_id, chunks.c.version_added >= version))
+
+        # Live chunks of the current version, by hash
+        live: Dict[str, Deque[Tuple[int, int, int]]] = defaultdict(deque)
+        rows = db.execute(
+            select(KnowledgeChunk.id, KnowledgeChunk.position, KnowledgeChunk.start_offset, KnowledgeChunk.content_hash)
+            .where(KnowledgeChunk.document_id == document_id, KnowledgeChunk.version_removed.is_(None))
+            .order_by(KnowledgeChunk.position)
+        )
+        for row in rows:
+            live[row.content_hash].append((row.id, row.position, row.start_offset))
+
+        inserts: List[dict] = []
+        moves: List[dict] = []
+        chunk_count = 0
+        added = 0
+        for start_offset, text in chunk_text(iter_document_text(path, filename), chunk_size, chunk_overlap):
+            digest = text_hash(text)
+            if live[digest]:
+                chunk_id, position, old_start_offset = live[digest].popleft()
+                if position != chunk_count or old_start_offset != start_offset:
+                    moves.append({
+                        "chunk_id": chunk_id,
+                        "new_position": chunk_count,
+                        "new_start_offset": start_offset,
+                        "new_text": text,
+                        "new_content_hash": digest,
+                    })
+            else:
+                inserts.append({
+                    "document_id": document_id,
+                    "position": chunk_count,
+                    "start_offset": start_offset,
+                    "text": text,
+                    "content_hash": digest,
+                    "version_added": version,
+                })
+                added += 1
+            chunk_count += 1
+            if len(inserts) >= INSERT_BATCH_SIZE:
+                db.execute(chunks.insert(), inserts)
+                inserts = []
+        if inserts:
+            db.execute(chunks.insert(), inserts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    removed_ids = [chunk_id for entries in live.values() for chunk_id, _, _ in entries]
+    logger.info(
+        f"Staged {filename} as {document_id} v{version}: {chunk_count} chunks, "
+        f"{added} added, {len(removed_ids)} removed"
+    )
+    return IngestedDocument(
+        document_id=document_id,
+        filename=filename,
+        size_bytes=size_bytes,
+        content_hash=content_hash,
+        chunk_count=chunk_count,
+        version=version,
+        chunks_added=added,
+        chunks_removed=len(removed_ids),
+        removed_ids=removed_ids,
+        moves=moves,
+    )
+
+
+def commit_version(document: IngestedDocument, content_type: Optional[str], chunk_size: int, chunk_overlap: int) -> None:
+    """Make a version staged by ``reingest_file`` the document's current one (blocking)"""
+    chunks = KnowledgeChunk.__table__
+    db = SessionLocal()
+    try:
+        row = db.get(KnowledgeDocument, document.document_id)
+        if row is None or row.version != document.version - 1:
+            raise IngestionError(f"Document {document.document_id} changed while v{document.version} was being indexed")
+        move = chunks.update().where(chunks.c.id == bindparam("chunk_id")).values(
+            position=bindparam("new_position"),
+            start_offset=bindparam("new_start_offset"),
+            text=bindparam("new_text"),
+            content_hash=bindparam("new_content_hash"),
+        )
+        for start in range(0, len(document.moves), INSERT_BATCH_SIZE):
+            db.execute(move, document.moves[start:start + INSERT_BATCH_SIZE])
+        for start in range(0, len(document.removed_ids), INSERT_BATCH_SIZE):
+            db.execute(
+                chunks.update()
+                .where(chunks.c.id.in_(document.removed_ids[start:start + INSERT_BATCH_SIZE]))
+                .values(version_removed=document.version)
+            )
+
+        row.filename = document.filename
+        row.content_type = content_type
+        row.content_hash = document.content_hash
+        row.size_bytes = document.size_bytes
+        row.chunk_count = document.chunk_count
+        row.chunk_size = chunk_size
+        row.chunk_overlap = chunk_overlap
+        row.version = document.version
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def discard_version(document_id: str, version: int) -> None:
+    """Drop the chunks of a staged version that will not be committed (blocking)"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            KnowledgeChunk.__table__.delete().where(
+                KnowledgeChunk.document_id == document_id,
+                KnowledgeChunk.version_added == version
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,258 @@
+"""
+BM25 keyword index for knowledge-base documents.
+
+Embedding search is weak on exact identifiers (SKUs, error codes), so every
+document also gets an inverted index built at ingestion time. Postings are
+stored compressed: per term, the chunk positions are delta-encoded and both
+the gaps and the term frequencies are written as LEB128 varints. Encoding
+and decoding are vectorised with NumPy, so scoring a query is a handful of
+array operations per query term.
+
+File layout::
+
+    header (64 bytes): magic "GKWD", format version, count, postings bytes,
+                       terms bytes, average chunk length
+    ids:               int64[count]   (knowledge_chunks.id)
+    lengths:           int32[count]   (tokens per chunk)
+    postings:          uint8[postings bytes]   (all gap runs, then all tf runs)
+    terms:             JSON {term: [gap offset, gap bytes, tf offset, tf bytes, df]}
+"""
+import json
+import math
+import os
+import re
+import struct
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from knowledge.index import top_k
+
+MAGIC = b"GKWD"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQQQd")
+HEADER_SIZE = 64
+
+# Identifiers such as "AB-1234", "E_404" or "v1.2.3" stay one token
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in at least this many chunks keep their decoded BM25 impacts in memory
+IMPACT_CACHE_MIN_DF = 8192
+IMPACT_CACHE_SIZE = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; compound identifiers are also split into their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-./:]", token) if part)
+    return tokens
+
+
+def varint_sizes(values: np.ndarray) -> np.ndarray:
+    """Encoded length in bytes of each non-negative integer"""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128-encode non-negative integers"""
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+    sizes = varint_sizes(values)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for byte in range(int(sizes.max())):
+        mask = sizes > byte
+        chunk = (values[mask] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        more = sizes[mask] > byte + 1
+        out[starts[mask] + byte] = chunk.astype(np.uint8) | (more.astype(np.uint8) << 7)
+    return out.tobytes()
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of ``encode_varints`` for a uint8 array"""
+    data = np.asarray(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if data.max() < 0x80:
+        # Dense postings: every gap and frequency fits in one byte
+        return data.astype(np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (7 * (np.arange(len(data)) - starts[group])).astype(np.uint64)
+    payload = (data & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(payload, starts).astype(np.int64)
+
+
+class KeywordIndexBuilder:
+    """Accumulates chunk texts and writes the compressed index file"""
+
+    def __init__(self):
+        self.ids = array("q")
+        self.lengths = array("i")
+        self.term_ids: Dict[str, int] = {}
+        # One (term, chunk position, frequency) triple per distinct term in a chunk
+        self._terms = array("i")
+        self._positions = array("i")
+        self._frequencies = array("i")
+
+    def add(self, chunk_id: int, text: str) -> None:
+        position = len(self.ids)
+        tokens = tokenize(text)
+        self.ids.append(chunk_id)
+        self.lengths.append(len(tokens))
+        for term, frequency in Counter(tokens).items():
+            self._terms.append(self.term_ids.setdefault(term, len(self.term_ids)))
+            self._positions.append(position)
+            self._frequencies.append(frequency)
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]) -> None:
+        for chunk_id, text in rows:
+            self.add(chunk_id, text)
+
+    def save(self, path: Path) -> None:
+        """Write the index to ``path`` atomically"""
+        path = Path(path)
+        term_ids = np.frombuffer(self._terms, dtype=np.int32)
+        # Stable sort keeps each term's postings in chunk order
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        positions = np.frombuffer(self._positions, dtype=np.int32)[order].astype(np.int64)
+        frequencies = np.frombuffer(self._frequencies, dtype=np.int32)[order]
+
+        segment_starts = np.flatnonzero(np.diff(term_ids, prepend=-1))
+        gaps = np.diff(positions, prepend=0)
+        gaps[segment_starts] = positions[segment_starts]
+        gap_blob = encode_varints(gaps)
+        tf_blob = encode_varints(frequencies)
+        gap_offsets, gap_lengths = self._segments(varint_sizes(gaps), segment_starts)
+        tf_offsets, tf_lengths = self._segments(varint_sizes(frequencies), segment_starts)
+        counts = np.diff(np.append(segment_starts, len(term_ids)))
+
+        names = list(self.term_ids)
+        terms = {
+            names[term]: [int(gap_offset), int(gap_length), len(gap_blob) + int(tf_offset), int(tf_length), int(count)]
+            for term, gap_offset, gap_length, tf_offset, tf_length, count in zip(
+                term_ids[segment_starts], gap_offsets, gap_lengths, tf_offsets, tf_lengths, counts
+            )
+        }
+        terms_json = json.dumps(terms, separators=(",", ":")).encode("utf-8")
+        count = len(self.ids)
+        average_length = sum(self.lengths) / count if count else 0.0
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, len(gap_blob) + len(tf_blob), len(terms_json), average_length).ljust(HEADER_SIZE, b"\0"))
+            out.write(self.ids.tobytes())
+            out.write(self.lengths.tobytes())
+            out.write(gap_blob)
+            out.write(tf_blob)
+            out.write(terms_json)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _segments(sizes: np.ndarray, segment_starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Byte offset and byte length of each term's run in an encoded stream"""
+        if len(segment_starts) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        lengths = np.add.reduceat(sizes, segment_starts)
+        return np.cumsum(lengths) - lengths, lengths
+
+
+class KeywordIndex:
+    """Read-only BM25 index over one document, memory-mapped from disk"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        stat = os.stat(self.path)
+        self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with open(self.path, "rb") as source:
+            magic, version, count, postings_size, terms_size, average_length = HEADER.unpack(source.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a keyword index")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported keyword index version: {version}")
+            postings_offset = HEADER_SIZE + count * 12
+            source.seek(postings_offset + postings_size)
+            self.terms: Dict[str, List[int]] = json.loads(source.read(terms_size))
+        self.count = count
+        self.average_length = average_length or 1.0
+        if count:
+            self.ids = np.memmap(self.path, dtype=np.int64, mode="r", offset=HEADER_SIZE, shape=(count,))
+            self.lengths = np.memmap(self.path, dtype=np.int32, mode="r", offset=HEADER_SIZE + count * 8, shape=(count,))
+        else:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.lengths = np.zeros(0, dtype=np.int32)
+        self.postings = np.memmap(self.path, dtype=np.uint8, mode="r", offset=postings_offset, shape=(postings_size,)) if postings_size else np.zeros(0, dtype=np.uint8)
+        # Per-chunk BM25 length normalisation, computed once per opened index
+        self._cached_impacts = lru_cache(maxsize=IMPACT_CACHE_SIZE)(self.impacts)
+        self.norms = (BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.lengths, dtype=np.float32) / self.average_length)).astype(np.float32)
+
+    def postings_for(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk positions and term frequencies of ``term``"""
+        entry = self.terms.get(term)
+        if entry is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        gap_offset, gap_size, tf_offset, tf_size, _ = entry
+        positions = np.cumsum(decode_varints(self.postings[gap_offset:gap_offset + gap_size]))
+        frequencies = decode_varints(self.postings[tf_offset:tf_offset + tf_size])
+        return positions, frequencies
+
+    def impacts(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk positions of ``term`` and its BM25 contribution to each"""
+        df = self.terms[term][4]
+        idf = np.float32(math.log(1 + (self.count - df + 0.5) / (df + 0.5)))
+        positions, frequencies = self.postings_for(term)
+        frequencies = frequencies.astype(np.float32)
+        return positions, idf * (BM25_K1 + 1) * frequencies / (frequencies + self.norms[positions])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for ``query``"""
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            # Frequent terms are the expensive ones to decode and the likeliest to repeat
+            positions, impacts = self._cached_impacts(term) if entry[4] >= IMPACT_CACHE_MIN_DF else self.impacts(term)
+            scores[positions] += impacts
+        return scores
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk ids and BM25 scores of the best ``k`` matching chunks"""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        columns, values = top_k(scores[matched][None, :], k)
+        return np.asarray(self.ids)[matched[columns[0]]], values[0]
+
+
+def reciprocal_rank_fusion(rankings: List[Tuple[List[int], float]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum(weight / (k + rank)), ranks from 1.
+
+    ``rankings`` holds ``(ids best first, weight)`` pairs; returns
+    ``(id, fused score)`` best first.
+    """
+    fused: Dict[int, float] = defaultdict(float)
+    for ids, weight in rankings:
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ids, start=1):
+            fused[item] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda pair: pair[1], reverse=True)
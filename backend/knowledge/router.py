@@ -0,0 +1,189 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile, File, Form, Depends
+from pydantic import BaseModel
+from typing import Optional
+import asyncio
+import logging
+import os
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from database.database import get_async_db
+from database.models import KnowledgeDocument
+from knowledge.ingest import IngestionError, ingest_file, save_upload
+from knowledge.service import (
+    KNOWLEDGE_DIR,
+    compact_document,
+    embedding_cache,
+    index_document,
+    knowledge_store,
+    needs_compaction,
+    update_document
+)
+from llm.embeddings import get_embedding_provider
+
+# Initialize router
+router = APIRouter(prefix="/knowledge", tags=["Knowledge"])
+logger = logging.getLogger(__name__)
+
+class DocumentResponse(BaseModel):
+    document_id: str
+    filename: str
+    size_bytes: int
+    content_hash: str
+    chunk_count: int
+    version: int = 1
+    chunks_added: int = 0
+    chunks_removed: int = 0
+
+def document_response(document: KnowledgeDocument) -> dict:
+    return {
+        "document_id": document.id,
+        "filename": document.filename,
+        "size_bytes": document.size_bytes,
+        "content_hash": document.content_hash,
+        "chunk_count": document.chunk_count,
+        "version": document.version
+    }
+
+def replace_source_file(document_id: str, path) -> None:
+    """Keep only the latest upload of a document on disk, named after the document"""
+    for old in KNOWLEDGE_DIR.glob(f"{document_id}*"):
+        if old.is_file():
+            old.unlink()
+    os.replace(path, KNOWLEDGE_DIR / (document_id + path.suffix))
+
+@router.post("/upload", response_model=DocumentResponse)
+async def upload_document(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    chunk_size: Optional[int] = Form(None),
+    chunk_overlap: Optional[int] = Form(None),
+    document_id: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload a file to the knowledge base.
+
+    The upload is copied to disk block by block, then its text is extracted
+    and chunked incrementally in a worker thread. The chunks are embedded
+    into the document's memory-mapped vector file and keyword-indexed
+    before the call returns.
+
+    Passing the ``document_id`` of an existing document stores the upload as
+    a new version of it: only chunks that changed are embedded, removed ones
+    are tombstoned and compacted in the background. Without a
+    ``document_id`` every upload is a new document, even if another one has
+    the same file name.
+    """
+    filename = os.path.basename(file.filename or "upload")
+    existing = stored = None
+    if document_id:
+        document = await db.get(KnowledgeDocument, document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        existing = document_response(document)
+        stored = (document.content_hash, document.chunk_size, document.chunk_overlap)
+    # Ingestion and embedding can take a while; don't hold a pooled connection meanwhile
+    await db.close()
+
+    chunk_size = chunk_size or (stored[1] if existing else config.KNOWLEDGE_CHUNK_SIZE)
+    if chunk_overlap is None:
+        chunk_overlap = stored[2] if existing else config.KNOWLEDGE_CHUNK_OVERLAP
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise HTTPException(status_code=422, detail="chunk_overlap must be between 0 and chunk_size")
+    if existing and knowledge_store.manifest(document_id) is None:
+        # An earlier upload stored the chunks but failed to index them
+        await index_document(document_id)
+
+    extension = os.path.splitext(filename)[1].lower()
+    # New documents are stored under their id; a new version is staged under
+    # a temporary name until it has been ingested
+    upload_id = str(uuid.uuid4())
+    path = KNOWLEDGE_DIR / (upload_id + extension)
+    try:
+        size_bytes, content_hash = await asyncio.to_thread(save_upload, file.file, path)
+        if existing is None:
+            document = await asyncio.to_thread(
+                ingest_file,
+                path,
+                filename,
+                file.content_type,
+                size_bytes,
+                content_hash,
+                chunk_size,
+                chunk_overlap,
+                upload_id
+            )
+        elif (content_hash, chunk_size, chunk_overlap) == stored:
+            # Versions are committed only once indexed, so the stored version is what is searched
+            path.unlink(missing_ok=True)
+            return existing
+        else:
+            document = await update_document(
+                document_id,
+                path,
+                filename,
+                file.content_type,
+                size_bytes,
+                content_hash,
+                chunk_size,
+                chunk_overlap
+            )
+            await asyncio.to_thread(replace_source_file, document_id, path)
+    except IngestionError as e:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=415, detail=str(e))
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    finally:
+        await file.close()
+
+    if existing is None:
+        await index_document(document.document_id)
+    elif needs_compaction(knowledge_store.manifest(document.document_id), document.chunk_count):
+        background_tasks.add_task(compact_document, document.document_id)
+
+    return {
+        "document_id": document.document_id,
+        "filename": document.filename,
+        "size_bytes": document.size_bytes,
+        "content_hash": document.content_hash,
+        "chunk_count": document.chunk_count,
+        "version": document.version,
+        "chunks_added": document.chunks_added,
+        "chunks_removed": document.chunks_removed
+    }
+
+@router.get("/documents/{document_id}", response_model=DocumentResponse)
+async def get_document(document_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Return the metadata of an ingested document"""
+    document = await db.get(KnowledgeDocument, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document_response(document)
+
+@router.post("/documents/{document_id}/compact")
+async def compact(document_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Drop the tombstoned chunks of a document and merge its index segments"""
+    if await db.get(KnowledgeDocument, document_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return await compact_document(document_id)
+
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats():
+    """Return hit/miss counters of the embedding cache for this worker"""
+    return embedding_cache.stats()
+
+@router.get("/embeddings/stats")
+async def get_embedding_client_stats():
+    """Return request coalescing counters of the embedding client for this worker"""
+    provider = get_embedding_provider()
+    if not hasattr(provider, "stats"):
+        return {"provider": provider.name, "model": provider.model, "batching": False}
+    return provider.stats()
+
+# Export the router
+__all__ = ["router"]
@@ -0,0 +1,315 @@
+"""
+Knowledge-base embedding and retrieval.
+
+``index_document`` streams a document's chunks out of the database, embeds
+them batch by batch straight into the document's memory-mapped vector file
+and builds its BM25 keyword index in the same pass. ``update_document``
+stores a re-upload as a chunk diff and embeds only the added chunks into a
+new segment; the keyword index is rebuilt over all live chunks, which needs
+no embedding and keeps BM25 scores comparable across versions.
+``compact_document`` later drops the tombstoned vectors.
+``retrieve`` runs the vector and keyword searches over the requested
+documents, fuses the two rankings with reciprocal rank fusion and loads
+the winning chunks in a single query.
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select
+
+import config
+from database.database import AsyncSessionLocal, DB_DIR
+from database.models import KnowledgeChunk, KnowledgeDocument
+from knowledge.embedding_cache import EmbeddingCache
+from knowledge.ingest import IngestedDocument, commit_version, discard_version, reingest_file
+from knowledge.keyword import KeywordIndexBuilder, reciprocal_rank_fusion
+from knowledge.store import DocumentManifest, KnowledgeStore
+from llm.embeddings import get_embedding_provider
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = Path(config.KNOWLEDGE_DIR) if config.KNOWLEDGE_DIR else DB_DIR / "knowledge"
+os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
+
+knowledge_store = KnowledgeStore(
+    KNOWLEDGE_DIR / "vectors",
+    ann_min_chunks=config.KNOWLEDGE_ANN_MIN_CHUNKS,
+    nprobe=config.KNOWLEDGE_ANN_NPROBE
+)
+embedding_cache = EmbeddingCache()
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_id: int
+    document_id: str
+    position: int
+    start_offset: int
+    text: str
+    score: float
+
+
+# Index writes to one document (upload, new version, compaction) run one at a time per worker
+_document_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+async def _index_segment(document_id: str, segment: str, chunks, count: int, with_keywords: bool = True) -> int:
+    """Embed (and optionally keyword-index) the chunks selected by ``chunks`` into ``segment``; returns cache hits"""
+    provider = get_embedding_provider()
+    keywords = KeywordIndexBuilder() if with_keywords else None
+    hits = 0
+    writer = knowledge_store.writer(segment, provider.dim, count)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(chunks.order_by(KnowledgeChunk.position))
+            async for rows in result.partitions(config.KNOWLEDGE_EMBED_BATCH_SIZE):
+                if keywords is not None:
+                    keywords.add_many((row.id, row.text) for row in rows)
+                vectors, batch_hits = await embedding_cache.embed(provider, [row.text for row in rows])
+                hits += batch_hits
+                writer.write([row.id for row in rows], vectors)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    if keywords is not None:
+        await asyncio.to_thread(keywords.save, knowledge_store.keyword_path(segment))
+    if count >= knowledge_store.ann_min_chunks:
+        await asyncio.to_thread(knowledge_store.build_ann, segment)
+    return hits
+
+
+def _live_chunks(document_id: str):
+    return select(KnowledgeChunk.id, KnowledgeChunk.text).where(
+        KnowledgeChunk.document_id == document_id,
+        KnowledgeChunk.version_removed.is_(None)
+    )
+
+
+async def _build_keywords(document_id: str, name: str, exclude: Set[int] = frozenset()) -> None:
+    """Keyword-index every live chunk of the document, except the ``exclude`` ids, into ``name``"""
+    keywords = KeywordIndexBuilder()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_live_chunks(document_id).order_by(KnowledgeChunk.position))
+        async for rows in result.partitions(1000):
+            keywords.add_many((row.id, row.text) for row in rows if row.id not in exclude)
+    await asyncio.to_thread(keywords.save, knowledge_store.keyword_path(name))
+
+
+async def index_document(document_id: str) -> int:
+    """Build the vector file and keyword index of a new document; returns the chunk count"""
+    async with _document_locks[document_id]:
+        async with AsyncSessionLocal() as db:
+            document = await db.get(KnowledgeDocument, document_id)
+            if document is None:
+                raise ValueError(f"Unknown document: {document_id}")
+        hits = await _index_segment(document_id, document_id, _live_chunks(document_id), document.chunk_count)
+        knowledge_store.publish(DocumentManifest(document_id, document.version, [document_id], document_id))
+    if document.chunk_count:
+        logger.info(f"Embedded {document_id}: {hits}/{document.chunk_count} chunks from the embedding cache")
+    return document.chunk_count
+
+
+def needs_compaction(manifest: Optional[DocumentManifest], live_chunks: int) -> bool:
+    if manifest is None:
+        return False
+    dead = len(manifest.dead)
+    if dead and dead / (dead + live_chunks) >= config.KNOWLEDGE_COMPACTION_RATIO:
+        return True
+    return len(manifest.segments) > config.KNOWLEDGE_MAX_SEGMENTS
+
+
+async def update_document(
+    document_id: str,
+    path: Path,
+    filename: str,
+    content_type: Optional[str],
+    size_bytes: int,
+    content_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> IngestedDocument:
+    """
+    Store a re-upload as a new version, embedding only the chunks it added.
+
+    Added chunks become a new segment and removed ones are tombstoned in the
+    manifest; no vector that was already indexed is rebuilt. The keyword
+    index is rebuilt from the live chunk texts, since BM25 statistics from a
+    segment of only the added chunks would not be comparable. The version is
+    committed to the database only after its manifest is published; if
+    indexing fails the staged chunks are dropped and the document stays on
+    its previous version.
+    """
+    async with _document_locks[document_id]:
+        document = await asyncio.to_thread(
+            reingest_file, path, document_id, filename, content_type, size_bytes, content_hash, chunk_size, chunk_overlap
+        )
+        manifest = knowledge_store.manifest(document_id)
+        segments = list(manifest.segments)
+        created: List[str] = []
+        published = False
+        try:
+            if document.chunks_added:
+                segment = knowledge_store.new_segment(document_id)
+                created.append(segment)
+                added = _live_chunks(document_id).where(KnowledgeChunk.version_added == document.version)
+                await _index_segment(document_id, segment, added, document.chunks_added, with_keywords=False)
+                segments.append(segment)
+            keywords = manifest.keywords
+            if document.chunks_added or document.removed_ids:
+                keywords = knowledge_store.new_segment(document_id)
+                created.append(keywords)
+                # The removed chunks are only tombstoned when the version is committed
+                await _build_keywords(document_id, keywords, exclude=set(document.removed_ids))
+            knowledge_store.publish(DocumentManifest(
+                document_id,
+                document.version,
+                segments,
+                keywords,
+                np.concatenate([manifest.dead, np.asarray(document.removed_ids, dtype=np.int64)])
+            ))
+            published = True
+            await asyncio.to_thread(commit_version, document, content_type, chunk_size, chunk_overlap)
+        except Exception:
+            if published:
+                knowledge_store.publish(manifest)
+            knowledge_store.delete_segments(created)
+            await asyncio.to_thread(discard_version, document_id, document.version)
+            raise
+        if keywords != manifest.keywords:
+            knowledge_store.delete_keywords([manifest.keywords])
+    return document
+
+
+async def compact_document(document_id: str) -> Dict[str, Any]:
+    """Fold a document's segments into one without its tombstoned chunks"""
+    async with _document_locks[document_id]:
+        manifest = knowledge_store.manifest(document_id)
+        if manifest is None:
+            return {"document_id": document_id, "compacted": False}
+        if len(manifest.segments) <= 1 and len(manifest.dead) == 0:
+            return {"document_id": document_id, "compacted": False, "segments": len(manifest.segments)}
+
+        segment = knowledge_store.new_segment(document_id)
+        # Vectors are copied, never re-embedded; the keyword index is rebuilt from the live texts
+        count = await asyncio.to_thread(knowledge_store.compact_vectors, manifest, segment)
+        await _build_keywords(document_id, segment)
+        if count >= knowledge_store.ann_min_chunks:
+            await asyncio.to_thread(knowledge_store.build_ann, segment)
+
+        knowledge_store.publish(DocumentManifest(document_id, manifest.version, [segment], segment))
+        knowledge_store.delete_segments(manifest.files())
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(KnowledgeChunk).where(
+                    KnowledgeChunk.document_id == document_id,
+                    KnowledgeChunk.version_removed.is_not(None)
+                )
+            )
+            await db.commit()
+
+    logger.info(f"Compacted {document_id}: {len(manifest.segments)} segments, {len(manifest.dead)} tombstones dropped")
+    return {
+        "document_id": document_id,
+        "compacted": True,
+        "segments_merged": len(manifest.segments),
+        "tombstones_dropped": len(manifest.dead),
+        "chunk_count": count,
+    }
+
+
+async def latest_document_id(filename: str) -> Optional[str]:
+    """The most recently uploaded document with this file name"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(KnowledgeDocument.id)
+            .where(KnowledgeDocument.filename == filename)
+            .order_by(KnowledgeDocument.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar()
+
+
+def explicit_document_ids(data: Dict[str, Any]) -> List[str]:
+    """Document ids a KnowledgeBase node names directly (``[]`` when it only names a file)"""
+    if data.get("documentIds"):
+        return [str(document_id) for document_id in data["documentIds"]]
+    if data.get("documentId"):
+        return [str(data["documentId"])]
+    return []
+
+
+async def resolve_document_ids(data: Dict[str, Any]) -> List[str]:
+    """Documents a KnowledgeBase node points at: explicit ids, else the latest upload of its file"""
+    document_ids = explicit_document_ids(data)
+    if document_ids:
+        return document_ids
+    if not data.get("fileName"):
+        return []
+    document_id = await latest_document_id(data["fileName"])
+    return [document_id] if document_id else []
+
+
+async def load_chunks(chunk_ids: List[int]) -> Dict[int, KnowledgeChunk]:
+    """Fetch chunks by id with one IN query"""
+    if not chunk_ids:
+        return {}
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(KnowledgeChunk).where(KnowledgeChunk.id.in_(chunk_ids), KnowledgeChunk.version_removed.is_(None))
+        )
+        return {chunk.id: chunk for chunk in result.scalars()}
+
+
+def _search(document_ids: List[str], query: str, query_vector, depth: int, vector_weight: float, keyword_weight: float) -> List[Tuple[int, float]]:
+    rankings = []
+    if vector_weight > 0:
+        ids, _ = knowledge_store.search(document_ids, query_vector, depth)
+        rankings.append(([int(chunk_id) for chunk_id in ids[0]], vector_weight))
+    if keyword_weight > 0:
+        ids, _ = knowledge_store.search_keywords(document_ids, query, depth)
+        rankings.append(([int(chunk_id) for chunk_id in ids], keyword_weight))
+    return reciprocal_rank_fusion(rankings, k=config.KNOWLEDGE_RRF_K)
+
+
+async def retrieve(
+    document_ids: List[str],
+    query: str,
+    k: int = 5,
+    vector_weight: Optional[float] = None,
+    keyword_weight: Optional[float] = None,
+) -> List[RetrievedChunk]:
+    """
+    Top-k chunks across ``document_ids`` for ``query``, best first.
+
+    Each side contributes ``weight / (KNOWLEDGE_RRF_K + rank)`` per chunk; a
+    weight of 0 skips that search entirely. ``score`` is the fused score.
+    """
+    if not document_ids or not query:
+        return []
+    vector_weight = float(config.KNOWLEDGE_VECTOR_WEIGHT if vector_weight is None else vector_weight)
+    keyword_weight = float(config.KNOWLEDGE_KEYWORD_WEIGHT if keyword_weight is None else keyword_weight)
+    query_vector = await get_embedding_provider().embed([query]) if vector_weight > 0 else None
+    # Rank deeper than k on each side so chunks found by both can rise
+    depth = k * config.KNOWLEDGE_HYBRID_DEPTH_FACTOR
+    fused = await asyncio.to_thread(_search, document_ids, query, query_vector, depth, vector_weight, keyword_weight)
+    fused = fused[:k]
+    chunks = await load_chunks([chunk_id for chunk_id, _ in fused])
+    return [
+        RetrievedChunk(
+            chunk_id=chunk_id,
+            document_id=chunks[chunk_id].document_id,
+            position=chunks[chunk_id].position,
+            start_offset=chunks[chunk_id].start_offset,
+            text=chunks[chunk_id].text,
+            score=score,
+        )
+        for chunk_id, score in fused
+        if chunk_id in chunks
+    ]
@@ -0,0 +1,385 @@
+"""
+Memory-mapped, on-disk vector store for knowledge-base documents.
+
+A document is made of one or more immutable segments. Each segment's
+embeddings live in one fixed-layout file::
+
+    header (64 bytes): magic "GVEC", format version, dim, count
+    vectors:           float32[count, dim]   (L2-normalised)
+    ids:               int64[count]          (knowledge_chunks.id)
+
+Files are opened with ``numpy.memmap``: nothing is deserialised on open and
+every uvicorn worker maps the same page-cached bytes instead of holding its
+own copy on the heap. Files are written to a temporary name and renamed into
+place, so readers never observe a half-written file.
+
+A small JSON manifest per document lists its segments and the chunk ids
+tombstoned by later versions. Re-uploads add a segment holding only the new
+chunks and tombstone the removed ones; ``compact_vectors`` folds everything
+back into a single segment without the dead rows.
+
+Segments with at least ``ann_min_chunks`` chunks also get an IVF index
+directory, searched with ``nprobe`` clusters. BM25 scores depend on
+collection-wide statistics (chunk count, document frequencies, average
+length), so keywords are not indexed per segment: the manifest names one
+keyword index file over all of the document's live chunks, rebuilt from
+their texts on every version (see ``knowledge.keyword``).
+"""
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge.ann import IVFIndex
+from knowledge.index import normalize, search_matrix
+from knowledge.keyword import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GVEC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIQ")
+HEADER_SIZE = 64
+COPY_BLOCK_ROWS = 65536
+
+
+class VectorFileWriter:
+    """Writes a vector file of a known size row block by row block"""
+
+    def __init__(self, path: Path, dim: int, count: int):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.dim = dim
+        self.count = count
+        with open(self.tmp_path, "wb") as out:
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, dim, count).ljust(HEADER_SIZE, b"\0"))
+            out.truncate(HEADER_SIZE + count * dim * 4 + count * 8)
+        self._vectors = np.memmap(self.tmp_path, dtype=np.float32, mode="r+", offset=HEADER_SIZE, shape=(count, dim)) if count else None
+        self._ids = np.memmap(self.tmp_path, dtype=np.int64, mode="r+", offset=HEADER_SIZE + count * dim * 4, shape=(count,)) if count else None
+        self.written = 0
+
+    def write(self, ids, vectors) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        end = self.written + len(ids)
+        if end > self.count:
+            raise ValueError("More rows written than the file was sized for")
+        self._vectors[self.written:end] = normalize(vectors)
+        self._ids[self.written:end] = ids
+        self.written = end
+
+    def close(self) -> None:
+        if self.written != self.count:
+            raise ValueError(f"Expected {self.count} rows, got {self.written}")
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+            del self._vectors, self._ids
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._vectors = self._ids = None
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class VectorFile:
+    """Read-only memory-mapped view of a vector file"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        stat = os.stat(self.path)
+        self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with open(self.path, "rb") as source:
+            magic, version, dim, count = HEADER.unpack(source.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a vector file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector file version: {version}")
+        self.dim = dim
+        self.count = count
+        if count:
+            self.vectors = np.memmap(self.path, dtype=np.float32, mode="r", offset=HEADER_SIZE, shape=(count, dim))
+            self.ids = np.memmap(self.path, dtype=np.int64, mode="r", offset=HEADER_SIZE + count * dim * 4, shape=(count,))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=np.int64)
+        self.ann: Optional[IVFIndex] = None
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        valid: Optional[np.ndarray] = None,
+        dead: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows; ``valid`` masks rows for exact search, ``dead`` ids are filtered from IVF results"""
+        queries = normalize(queries)
+        if self.ann is None:
+            return search_matrix(self.vectors, self.ids, queries, k, valid=valid)
+        if dead is None or len(dead) == 0:
+            return self.ann.search_batch(queries, k, nprobe)
+        # Over-fetch by the number of tombstones, then drop them
+        ids, scores = self.ann.search_batch(queries, k + len(dead), nprobe)
+        return _drop_dead(ids, scores, dead, k)
+
+
+def _drop_dead(ids: np.ndarray, scores: np.ndarray, dead: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the first k non-tombstoned columns of each row of a ranked result"""
+    is_dead = np.isin(ids, dead)
+    order = np.argsort(is_dead, axis=1, kind="stable")[:, :k]
+    ids, scores = np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+    keep = ~np.take_along_axis(is_dead, order, axis=1).any(axis=0)
+    return ids[:, keep], scores[:, keep]
+
+
+class DocumentManifest:
+    """The segments of a document, its keyword index and the chunk ids tombstoned in them"""
+
+    def __init__(self, document_id: str, version: int, segments: List[str], keywords: str, dead: Iterable[int] = ()):
+        self.document_id = document_id
+        self.version = version
+        self.segments = list(segments)
+        # Name of the keyword index over every live chunk
+        self.keywords = keywords
+        self.dead = np.unique(np.fromiter(dead, dtype=np.int64))
+        self.signature = None
+        self._masks: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "DocumentManifest":
+        stat = os.stat(path)
+        with open(path) as source:
+            data = json.load(source)
+        manifest = cls(data["document_id"], data["version"], data["segments"], data["keywords"], data["dead"])
+        manifest.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return manifest
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "document_id": self.document_id,
+            "version": self.version,
+            "segments": self.segments,
+            "keywords": self.keywords,
+            "dead": self.dead.tolist(),
+        }
+
+    def files(self) -> List[str]:
+        """Names of every file set the manifest refers to: its segments and its keyword index"""
+        if self.keywords in self.segments:
+            return list(self.segments)
+        return [*self.segments, self.keywords]
+
+    def valid_mask(self, segment: str, ids: np.ndarray) -> Optional[np.ndarray]:
+        """Rows of ``segment`` that are not tombstoned (``None`` when nothing is)"""
+        if len(self.dead) == 0:
+            return None
+        mask = self._masks.get(segment)
+        if mask is None:
+            mask = self._masks[segment] = ~np.isin(ids, self.dead)
+        return mask
+
+
+class KnowledgeStore:
+    """Per-document segment files in one directory, opened lazily and cached"""
+
+    def __init__(self, directory: Path, ann_min_chunks: int = 100000, nprobe: int = 16, max_open: int = 64):
+        self.directory = Path(directory)
+        self.ann_min_chunks = ann_min_chunks
+        self.nprobe = nprobe
+        self.max_open = max_open
+        self._open: "OrderedDict[str, VectorFile]" = OrderedDict()
+        self._keywords: "OrderedDict[str, KeywordIndex]" = OrderedDict()
+        self._manifests: "OrderedDict[str, DocumentManifest]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def vector_path(self, segment: str) -> Path:
+        return self.directory / f"{segment}.vec"
+
+    def ann_path(self, segment: str) -> Path:
+        return self.directory / f"{segment}.ivf"
+
+    def keyword_path(self, segment: str) -> Path:
+        return self.directory / f"{segment}.bm25"
+
+    def manifest_path(self, document_id: str) -> Path:
+        return self.directory / f"{document_id}.json"
+
+    def new_segment(self, document_id: str) -> str:
+        return f"{document_id}.{uuid.uuid4().hex[:12]}"
+
+    def writer(self, segment: str, dim: int, count: int) -> VectorFileWriter:
+        return VectorFileWriter(self.vector_path(segment), dim, count)
+
+    def build_ann(self, segment: str) -> None:
+        """Build the IVF index for a large segment from its vector file"""
+        vector_file = VectorFile(self.vector_path(segment))
+        if vector_file.count < self.ann_min_chunks:
+            return
+        nlist = max(int(4 * np.sqrt(vector_file.count)), 1)
+        ann = IVFIndex(vector_file.dim, nlist=nlist, nprobe=self.nprobe)
+        ann.train(np.asarray(vector_file.vectors))
+        for start in range(0, vector_file.count, COPY_BLOCK_ROWS):
+            ann.add(vector_file.ids[start:start + COPY_BLOCK_ROWS], vector_file.vectors[start:start + COPY_BLOCK_ROWS])
+        ann.save(self.ann_path(segment))
+        logger.info(f"Built IVF index for {segment}: {vector_file.count} vectors, nlist {nlist}")
+
+    def _cached(self, cache: OrderedDict, key: str, path: Path, load: Callable[[Path], object]):
+        """LRU lookup that re-opens ``path`` when it was replaced on disk"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = cache.get(key)
+            if cached is not None and cached.signature == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                cache.move_to_end(key)
+                return cached
+            opened = load(path)
+            cache[key] = opened
+            while len(cache) > self.max_open:
+                cache.popitem(last=False)
+            return opened
+
+    def _load_vector_file(self, path: Path) -> VectorFile:
+        vector_file = VectorFile(path)
+        ann_path = path.with_suffix(".ivf")
+        if vector_file.count >= self.ann_min_chunks and (ann_path / "index.json").exists():
+            vector_file.ann = IVFIndex.load(ann_path)
+        return vector_file
+
+    def open(self, segment: str) -> Optional[VectorFile]:
+        """Return the mapped vector file, re-opening it if it was replaced on disk"""
+        return self._cached(self._open, segment, self.vector_path(segment), self._load_vector_file)
+
+    def open_keywords(self, segment: str) -> Optional[KeywordIndex]:
+        """Return the segment's keyword index, re-opening it if it was replaced on disk"""
+        return self._cached(self._keywords, segment, self.keyword_path(segment), KeywordIndex)
+
+    def manifest(self, document_id: str) -> Optional[DocumentManifest]:
+        """The document's current manifest (``None`` if it was never indexed)"""
+        return self._cached(self._manifests, document_id, self.manifest_path(document_id), DocumentManifest.load)
+
+    def publish(self, manifest: DocumentManifest) -> None:
+        """Atomically make ``manifest`` the document's current state"""
+        path = self.manifest_path(manifest.document_id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as out:
+            json.dump(manifest.to_json(), out)
+        os.replace(tmp_path, path)
+
+    def compact_vectors(self, manifest: DocumentManifest, segment: str) -> int:
+        """Copy the live rows of every segment into one new segment; returns its row count"""
+        sources = [self.open(name) for name in manifest.segments]
+        sources = [(name, vector_file) for name, vector_file in zip(manifest.segments, sources) if vector_file is not None]
+        if not sources:
+            return 0
+        masks = [manifest.valid_mask(name, vector_file.ids) for name, vector_file in sources]
+        count = sum(vector_file.count if mask is None else int(mask.sum()) for (_, vector_file), mask in zip(sources, masks))
+        writer = self.writer(segment, sources[0][1].dim, count)
+        try:
+            for (_, vector_file), mask in zip(sources, masks):
+                for start in range(0, vector_file.count, COPY_BLOCK_ROWS):
+                    rows = slice(start, start + COPY_BLOCK_ROWS)
+                    if mask is None:
+                        writer.write(vector_file.ids[rows], vector_file.vectors[rows])
+                    else:
+                        writer.write(vector_file.ids[rows][mask[rows]], vector_file.vectors[rows][mask[rows]])
+            writer.close()
+        except Exception:
+            writer.abort()
+            raise
+        return count
+
+    def delete_segments(self, segments: List[str]) -> None:
+        with self._lock:
+            for segment in segments:
+                self._open.pop(segment, None)
+                self._keywords.pop(segment, None)
+        for segment in segments:
+            self.vector_path(segment).unlink(missing_ok=True)
+            self.keyword_path(segment).unlink(missing_ok=True)
+            shutil.rmtree(self.ann_path(segment), ignore_errors=True)
+
+    def delete_keywords(self, names: List[str]) -> None:
+        """Remove keyword index files only, leaving any vectors of the same name"""
+        with self._lock:
+            for name in names:
+                self._keywords.pop(name, None)
+        for name in names:
+            self.keyword_path(name).unlink(missing_ok=True)
+
+    def delete(self, document_id: str) -> None:
+        manifest = self.manifest(document_id)
+        segments = manifest.files() if manifest is not None else []
+        with self._lock:
+            self._manifests.pop(document_id, None)
+        self.manifest_path(document_id).unlink(missing_ok=True)
+        self.delete_segments(segments)
+
+    def _segments(self, document_ids: List[str]):
+        for document_id in document_ids:
+            manifest = self.manifest(document_id)
+            if manifest is None:
+                continue
+            for segment in manifest.segments:
+                yield manifest, segment
+
+    def search(self, document_ids: List[str], queries, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids and scores per query across several documents"""
+        queries = normalize(queries)
+        all_ids: List[np.ndarray] = []
+        all_scores: List[np.ndarray] = []
+        for manifest, segment in self._segments(document_ids):
+            vector_file = self.open(segment)
+            if vector_file is None or vector_file.count == 0:
+                continue
+            valid = manifest.valid_mask(segment, vector_file.ids) if vector_file.ann is None else None
+            ids, scores = vector_file.search(queries, k, self.nprobe, valid=valid, dead=manifest.dead)
+            all_ids.append(ids)
+            all_scores.append(scores)
+        if not all_ids:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        ids = np.concatenate(all_ids, axis=1)
+        scores = np.concatenate(all_scores, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def search_keywords(self, document_ids: List[str], query: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids and BM25 scores for ``query`` across several documents"""
+        all_ids: List[np.ndarray] = []
+        all_scores: List[np.ndarray] = []
+        for document_id in document_ids:
+            manifest = self.manifest(document_id)
+            if manifest is None:
+                continue
+            # Built from the live chunks only, so there is nothing to tombstone
+            index = self.open_keywords(manifest.keywords)
+            if index is None or index.count == 0:
+                continue
+            ids, scores = index.search(query, k)
+            all_ids.append(ids)
+            all_scores.append(scores)
+        if not all_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return ids[order], scores[order]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directory": str(self.directory),
+            "open_files": len(self._open),
+            "open_keyword_indexes": len(self._keywords),
+            "open_manifests": len(self._manifests),
+        }
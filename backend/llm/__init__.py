@@ -0,0 +1 @@
+# Initialize the llm package
@@ -0,0 +1,196 @@
+"""
+Exact-match cache of LLM responses.
+
+Workflow runs and chat requests often send byte-identical prompts, so
+``cached_generate`` keys every completion on (provider, model, rendered
+prompt, generation parameters). Lookups hit a bounded in-process LRU first
+and fall back to a WAL-mode SQLite file shared by every worker; entries
+carry their own expiry time in both tiers. Only the LRU is consulted on the
+event loop; SQLite reads and writes run in a worker thread
+(``SharedSQLiteFile``). Concurrent misses for the same key share one
+provider call through ``SingleFlight``.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+from database.sqlite import SharedSQLiteFile
+from llm.providers import LLMProvider, get_provider
+from llm.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are deleted from the SQLite tier once every this many writes
+SWEEP_EVERY_WRITES = 1000
+
+
+def cache_key(provider: LLMProvider, prompt: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        [provider.name, provider.model, prompt, params],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-process LRU of responses in front of an optional SQLite tier.
+
+    Expiry times are wall-clock so that an entry written by one worker
+    expires at the same moment for all of them.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024, ttl: float = 86400.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.db: Optional[SharedSQLiteFile] = None
+        if path:
+            self.db = SharedSQLiteFile(path, schema=[
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS ix_llm_responses_expires_at ON llm_responses (expires_at)",
+            ])
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.l1_hits += 1
+                    return response
+                del self._entries[key]
+                self.expirations += 1
+        if self.db is not None:
+            row = await self.db.fetchone(
+                "SELECT response, expires_at FROM llm_responses WHERE key = ? AND expires_at > ?", (key, now)
+            )
+            if row is not None:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.l2_hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, response: str, ttl: Optional[float] = None) -> None:
+        """Store ``response``; ``ttl`` overrides the cache default for this entry"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self.writes += 1
+            writes = self.writes
+        if self.db is not None:
+            await self.db.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at),
+            )
+        if writes % SWEEP_EVERY_WRITES == 0:
+            await self.sweep()
+
+    async def sweep(self) -> int:
+        """Drop expired entries from both tiers and return how many SQLite rows were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            self.expirations += len(expired)
+        if self.db is None:
+            return 0
+        return await self.db.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,))
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db is not None:
+            await self.db.execute("DELETE FROM llm_responses")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.l1_hits + self.l2_hits
+        lookups = hits + self.misses
+        return {
+            "l1_size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "path": self.path,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the worker's response cache, or ``None`` when LLM_CACHE_ENABLED is off"""
+    global _response_cache
+    if _response_cache is None and config.LLM_CACHE_ENABLED:
+        from database.database import DB_DIR
+        _response_cache = ResponseCache(
+            config.LLM_CACHE_DB_PATH or str(DB_DIR / "llm_cache.db"),
+            max_entries=config.LLM_CACHE_MAX_ENTRIES,
+            ttl=config.LLM_CACHE_TTL_SECONDS
+        )
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Override the configured cache (``None`` resets to the config default)"""
+    global _response_cache
+    _response_cache = cache
+
+
+# Identical generations in flight in this worker
+in_flight = SingleFlight()
+
+
+async def cached_generate(prompt: str, ttl: Optional[float] = None, **params) -> str:
+    """``get_provider().generate`` behind the response cache and single-flight coalescing"""
+    provider = get_provider()
+    cache = get_response_cache()
+    key = cache_key(provider, prompt, params)
+    if cache is not None:
+        response = await cache.get(key)
+        if response is not None:
+            return response
+
+    async def generate() -> str:
+        response = await provider.generate(prompt, **params)
+        # Empty completions (e.g. a blocked prompt) are not worth replaying
+        if cache is not None and response:
+            await cache.set(key, response, ttl=ttl)
+        return response
+
+    if not config.LLM_SINGLE_FLIGHT:
+        return await generate()
+    return await in_flight.do(key, generate)
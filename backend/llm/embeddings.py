@@ -0,0 +1,212 @@
+"""
+Async embedding providers.
+
+``FakeEmbeddingProvider`` hashes word unigrams and bigrams into a fixed
+number of dimensions, so it is deterministic, needs no network and still
+gives texts that share words a high cosine similarity. The OpenAI adapter
+serves the ``text-embedding-3-*`` models offered by the KnowledgeBase node
+and uses the shared HTTP client from ``llm.providers``.
+
+``BatchingEmbeddingClient`` wraps any provider and coalesces concurrent
+``embed`` calls (uploads, workflow queries) into one provider request per
+``max_batch_size`` texts or ``max_wait_ms`` window, whichever comes first.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+import numpy as np
+
+import config
+from llm.providers import ProviderError, get_http_client
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class EmbeddingProvider(ABC):
+    """Interface every embedding backend implements"""
+
+    name: str = "base"
+    model: str = ""
+    dim: int = 0
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix"""
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """Deterministic feature-hashing embeddings for local runs and tests"""
+
+    name = "fake"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model = f"fake-hash-{dim}"
+        self.calls = 0
+
+    def _features(self, text: str) -> List[str]:
+        words = WORD_PATTERN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed_one(text) for text in texts])
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API via the shared HTTP client"""
+
+    name = "openai"
+    url = "https://api.openai.com/v1/embeddings"
+
+    def __init__(self, api_key: str, model: str, dim: Optional[int] = None):
+        if not api_key:
+            raise ProviderError("OPENAI_API_KEY environment variable is not set")
+        self.api_key = api_key
+        self.model = model
+        # text-embedding-3-large defaults to 3072 dimensions and can be shortened
+        self.dim = dim or 3072
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        try:
+            response = await get_http_client().post(
+                self.url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={"model": self.model, "input": texts, "dimensions": self.dim},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ProviderError(f"Embedding request failed: {str(e)}") from e
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+
+
+class BatchingEmbeddingClient(EmbeddingProvider):
+    """Coalesces concurrent embed calls into batched provider requests"""
+
+    def __init__(self, provider: EmbeddingProvider, max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        self.provider = provider
+        self.name = provider.name
+        self.model = provider.model
+        self.dim = provider.dim
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.provider_calls = 0
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((list(texts), future))
+        self._pending_texts += len(texts)
+        self.requests += 1
+        self.texts += len(texts)
+        if self._pending_texts >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[List[str], asyncio.Future]]) -> None:
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        self.batches += 1
+        try:
+            # A single oversized request is still split at max_batch_size
+            parts = await asyncio.gather(*(
+                self.provider.embed(texts[start:start + self.max_batch_size])
+                for start in range(0, len(texts), self.max_batch_size)
+            ))
+            self.provider_calls += len(parts)
+            vectors = np.concatenate(parts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for request_texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.name,
+            "model": self.model,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "provider_calls": self.provider_calls,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "pending": self._pending_texts,
+        }
+
+
+_embedding_provider: Optional[EmbeddingProvider] = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Return the configured embedding provider (one instance per worker)"""
+    global _embedding_provider
+    if _embedding_provider is None:
+        if config.EMBEDDING_PROVIDER == "openai":
+            _embedding_provider = OpenAIEmbeddingProvider(config.OPENAI_API_KEY, config.EMBEDDING_MODEL, config.EMBEDDING_DIM)
+        elif config.EMBEDDING_PROVIDER == "fake":
+            _embedding_provider = FakeEmbeddingProvider(config.EMBEDDING_DIM or 256)
+        else:
+            raise ProviderError(f"Unknown embedding provider: {config.EMBEDDING_PROVIDER}")
+        if config.EMBEDDING_BATCH_MAX_SIZE > 1:
+            _embedding_provider = BatchingEmbeddingClient(
+                _embedding_provider,
+                max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS
+            )
+        logger.info(f"Using embedding provider: {_embedding_provider.name} ({_embedding_provider.model})")
+    return _embedding_provider
+
+
+def set_embedding_provider(provider: Optional[EmbeddingProvider]) -> None:
+    """Override the configured provider (``None`` resets to the config default)"""
+    global _embedding_provider
+    _embedding_provider = provider
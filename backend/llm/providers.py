@@ -0,0 +1,164 @@
+"""
+Async LLM provider layer.
+
+Every model call goes through an ``LLMProvider`` so request handlers never
+block the event loop. HTTP-backed providers share one pooled
+``httpx.AsyncClient`` for the lifetime of the worker.
+"""
+import asyncio
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+import httpx
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Raised when a model provider call fails"""
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the worker-wide HTTP client, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.LLM_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class LLMProvider(ABC):
+    """Interface every model backend implements"""
+
+    name: str = "base"
+    model: str = ""
+
+    @abstractmethod
+    async def generate(self, prompt: str, **params) -> str:
+        """Return the full completion for ``prompt``"""
+
+    async def stream(self, prompt: str, **params) -> AsyncIterator[str]:
+        """Yield the completion in chunks as the backend produces them"""
+        yield await self.generate(prompt, **params)
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic local provider used by default and in tests"""
+
+    name = "fake"
+    model = "echo"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def generate(self, prompt: str, **params) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return f"You said: {prompt}"
+
+    async def stream(self, prompt: str, **params) -> AsyncIterator[str]:
+        # Words with their trailing space, so the tokens join back into the exact completion
+        for token in re.split(r"(?<= )", await self.generate(prompt, **params)):
+            if token:
+                yield token
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via its REST API, using the shared HTTP client"""
+
+    name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+
+    def __init__(self, api_key: str, model: str):
+        if not api_key:
+            raise ProviderError("GEMINI_API_KEY environment variable is not set")
+        self.api_key = api_key
+        self.model = model
+
+    def _payload(self, prompt: str, params: dict) -> dict:
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if params:
+            payload["generationConfig"] = params
+        return payload
+
+    @staticmethod
+    def _extract_text(body: dict) -> str:
+        candidates = body.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate(self, prompt: str, **params) -> str:
+        try:
+            response = await get_http_client().post(
+                f"{self.base_url}/{self.model}:generateContent",
+                params={"key": self.api_key},
+                json=self._payload(prompt, params),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ProviderError(f"Gemini request failed: {str(e)}") from e
+        return self._extract_text(response.json())
+
+    async def stream(self, prompt: str, **params) -> AsyncIterator[str]:
+        try:
+            async with get_http_client().stream(
+                "POST",
+                f"{self.base_url}/{self.model}:streamGenerateContent",
+                params={"key": self.api_key, "alt": "sse"},
+                json=self._payload(prompt, params),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    text = self._extract_text(json.loads(line[5:]))
+                    if text:
+                        yield text
+        except httpx.HTTPError as e:
+            raise ProviderError(f"Gemini stream failed: {str(e)}") from e
+
+
+_provider: Optional[LLMProvider] = None
+
+
+def get_provider() -> LLMProvider:
+    """Return the configured provider (one instance per worker)"""
+    global _provider
+    if _provider is None:
+        if config.LLM_PROVIDER == "gemini":
+            _provider = GeminiProvider(config.GEMINI_API_KEY, config.GEMINI_MODEL)
+        elif config.LLM_PROVIDER == "fake":
+            _provider = FakeProvider()
+        else:
+            raise ProviderError(f"Unknown LLM provider: {config.LLM_PROVIDER}")
+        logger.info(f"Using LLM provider: {_provider.name}")
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]) -> None:
+    """Override the configured provider (``None`` resets to the config default)"""
+    global _provider
+    _provider = provider
@@ -0,0 +1,86 @@
+"""
+Application logging setup.
+
+``development`` mode logs plain text straight to stderr. ``production`` mode
+hands records to a ``QueueHandler`` so request handlers only pay for an
+in-memory enqueue; a ``QueueListener`` thread formats them as JSON lines
+and does the actual I/O.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import config
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Fields passed through ``extra=`` end up as record attributes
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse ``"sqlalchemy.engine=WARNING,chat=DEBUG"`` into a mapping"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """Install handlers for the configured LOG_MODE (safe to call more than once)"""
+    global _listener
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if config.LOG_MODE == "production":
+        stream_handler.setFormatter(JsonFormatter())
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(stream_handler)
+
+    root.setLevel(config.LOG_LEVEL)
+    # SQL statements are only logged when SQL_ECHO is enabled
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if config.SQL_ECHO else logging.WARNING)
+    for name, level in parse_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -5,19 +5,22 @@ import logging
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uvicorn
 
+from logging_config import configure_logging, shutdown_logging
+
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 # Log Python version and paths
-logger.info(f"Python version: {sys.version}")
-logger.info(f"Current working directory: {os.getcwd()}")
-logger.info(f"Python path: {sys.path}")
+logger.debug(f"Python version: {sys.version}")
+logger.debug(f"Current working directory: {os.getcwd()}")
+logger.debug(f"Python path: {sys.path}")
 
 # Initialize FastAPI app with detailed metadata
 app = FastAPI(
@@ -32,13 +35,12 @@ app = FastAPI(
 # Log startup configuration
 logger.info("FastAPI application initialized")
 
-from database.database import engine, get_db
+from database.database import engine, get_db, get_async_db, async_engine, get_pool_stats
 import database.models as models
-from chat.router import router as chat_router
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from chat.router import router as chat_router, session_store, history_writer
+from workflows.router import router as workflows_router
+from knowledge.router import router as knowledge_router
+from llm.providers import close_http_client
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
@@ -54,7 +56,7 @@ app = FastAPI(
 )
 
 @app.get("/test-db")
-async def test_db(db: Session = Depends(get_db)):
+async def test_db(db: AsyncSession = Depends(get_async_db)):
     """Test database connection and user creation"""
     try:
     
@@ -65,14 +67,15 @@ async def test_db(db: Session = Depends(get_db)):
             full_name="Test User"
         )
         db.add(test_user)
-        db.commit()
+        await db.commit()
         
       
-        user = db.query(models.User).filter(models.User.email == "test@example.com").first()
+        result = await db.execute(select(models.User).filter(models.User.email == "test@example.com"))
+        user = result.scalars().first()
         
         if user:
-            db.delete(user)
-            db.commit()
+            await db.delete(user)
+            await db.commit()
             
         return {
             "status": "success",
@@ -87,6 +90,22 @@ async def test_db(db: Session = Depends(get_db)):
             "test_user_created_and_removed": False
         }
 
+@app.on_event("startup")
+async def startup():
+    """Start background maintenance tasks"""
+    session_store.start_sweeper()
+    history_writer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background tasks and release pooled connections"""
+    await session_store.stop_sweeper()
+    # Flush queued chat history before the worker exits
+    await history_writer.stop()
+    await async_engine.dispose()
+    shutdown_logging()
+    await close_http_client()
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -109,6 +128,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Include routers with /api prefix
 # Authentication disabled
 app.include_router(chat_router, prefix="/api")
+app.include_router(workflows_router, prefix="/api")
+app.include_router(knowledge_router, prefix="/api")
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -127,6 +148,11 @@ async def health_check():
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
 
+@app.get("/api/health/db-pool", tags=["Health"])
+async def db_pool_stats():
+    """Connection pool usage: checked-out connections, overflow and checkout wait times"""
+    return get_pool_stats()
+
 @app.get("/debug/routes")
 async def debug_routes():
     routes = []
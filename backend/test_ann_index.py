@@ -0,0 +1,55 @@
+import numpy as np
+
+from knowledge.ann import IVFIndex
+from knowledge.index import VectorIndex
+
+
+def clustered(rng, count, dim, centers=20):
+    means = rng.normal(size=(centers, dim))
+    return means[rng.integers(0, centers, size=count)] + 0.3 * rng.normal(size=(count, dim))
+
+
+def test_untrained_index_searches_exactly():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8))
+    index = IVFIndex(dim=8, nlist=16)
+    index.add(np.arange(50), vectors)
+
+    exact = VectorIndex(dim=8)
+    exact.add(np.arange(50), vectors)
+    assert not index.is_trained
+    np.testing.assert_array_equal(index.search(vectors[3], k=5)[0], exact.search(vectors[3], k=5)[0])
+
+
+def test_full_probe_matches_exact_search():
+    rng = np.random.default_rng(1)
+    vectors = clustered(rng, 2000, 16)
+    index = IVFIndex(dim=16, nlist=32, train_size=1000)
+    index.add(np.arange(1000), vectors[:1000])
+    index.add(np.arange(1000, 2000), vectors[1000:])  # incremental insertion after training
+    exact = VectorIndex(dim=16)
+    exact.add(np.arange(2000), vectors)
+
+    assert index.is_trained and len(index) == 2000
+    queries = clustered(rng, 5, 16)
+    np.testing.assert_array_equal(index.search_batch(queries, k=10, nprobe=32)[0], exact.search_batch(queries, k=10)[0])
+
+
+def test_recall_with_few_probes(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = clustered(rng, 5000, 16)
+    index = IVFIndex(dim=16, nlist=32, nprobe=8)
+    index.train(vectors)
+    index.add(np.arange(5000), vectors)
+    exact = VectorIndex(dim=16)
+    exact.add(np.arange(5000), vectors)
+
+    queries = clustered(rng, 50, 16)
+    approx_ids, _ = index.search_batch(queries, k=10)
+    exact_ids, _ = exact.search_batch(queries, k=10)
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approx_ids, exact_ids)])
+    assert recall > 0.9
+
+    index.save(tmp_path / "ivf")
+    loaded = IVFIndex.load(tmp_path / "ivf")
+    np.testing.assert_array_equal(loaded.search_batch(queries, k=10)[0], approx_ids)
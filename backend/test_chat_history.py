@@ -0,0 +1,65 @@
+import asyncio
+
+from chat.history import ChatHistoryWriter
+
+
+class Recorder(list):
+    async def __call__(self, rows):
+        self.append(rows)
+
+
+def test_rows_are_written_in_batches():
+    batches = Recorder()
+    writer = ChatHistoryWriter(batch_size=10, flush_interval=0.05, insert_rows=batches)
+
+    async def run():
+        await asyncio.gather(*(writer.write("s", f"message {i}", "reply") for i in range(25)))
+        await writer.stop()
+
+    asyncio.run(run())
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert writer.stats()["rows_written"] == 25
+
+
+def test_stop_flushes_pending_rows():
+    batches = Recorder()
+    writer = ChatHistoryWriter(batch_size=100, flush_interval=60, insert_rows=batches)
+
+    async def run():
+        await writer.write("s", "hello", "reply")
+        await writer.stop()
+
+    asyncio.run(run())
+    assert len(batches) == 1 and batches[0][0]["user_message"] == "hello"
+
+
+def test_durable_write_waits_for_commit():
+    batches = Recorder()
+    writer = ChatHistoryWriter(durability="durable", insert_rows=batches)
+
+    async def run():
+        await writer.write("s", "hello", "reply")
+        committed = len(batches)
+        await writer.stop()
+        return committed
+
+    assert asyncio.run(run()) == 1
+
+
+def test_durable_write_surfaces_failures():
+    async def fail(rows):
+        raise RuntimeError("disk full")
+
+    writer = ChatHistoryWriter(durability="durable", insert_rows=fail)
+
+    async def run():
+        try:
+            await writer.write("s", "hello", "reply")
+        except RuntimeError:
+            return True
+        finally:
+            await writer.stop()
+        return False
+
+    assert asyncio.run(run())
+    assert writer.stats()["rows_failed"] == 1
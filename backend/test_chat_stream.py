@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import chat.router as chat_router
+from chat.history import ChatHistoryWriter
+from llm.providers import FakeProvider, ProviderError, set_provider
+
+
+class Recorder(list):
+    async def __call__(self, rows):
+        self.extend(rows)
+
+
+class FailingProvider(FakeProvider):
+    async def stream(self, prompt: str, **params):
+        yield "partial "
+        raise ProviderError("upstream unavailable")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    rows = Recorder()
+    # Durable writes are committed before the stream closes
+    monkeypatch.setattr(chat_router, "history_writer", ChatHistoryWriter(durability="durable", insert_rows=rows))
+    app = FastAPI()
+    app.include_router(chat_router.router, prefix="/api")
+    with TestClient(app) as client:
+        client.rows = rows
+        yield client
+    set_provider(None)
+
+
+def read_events(response):
+    events = []
+    for frame in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_tokens_then_done_and_saves_history(client):
+    set_provider(FakeProvider())
+    response = client.post("/api/chat/stream", json={"message": "hello  there"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = read_events(response)
+    tokens = [data["token"] for event, data in events if event == "message"]
+    assert "".join(tokens) == "You said: hello  there"
+    event, done = events[-1]
+    assert event == "done" and done["session_id"]
+
+    assert len(client.rows) == 1
+    assert client.rows[0]["session_id"] == done["session_id"]
+    assert client.rows[0]["ai_response"] == "You said: hello  there"
+
+
+def test_provider_failure_ends_the_stream_with_an_error_event(client):
+    set_provider(FailingProvider())
+    events = read_events(client.post("/api/chat/stream", json={"message": "hello"}))
+    assert events[0] == ("message", {"token": "partial "})
+    assert events[-1][0] == "error" and "upstream unavailable" in events[-1][1]["error"]
+    assert client.rows == []
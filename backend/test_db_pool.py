@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from database.pool import TimedQueuePool, pool_stats
+
+
+def make_engine(tmp_path):
+    return create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+
+
+def test_checkouts_are_counted(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.connect():
+        stats = pool_stats(engine.pool)
+        assert stats["checked_out"] == 1
+    stats = pool_stats(engine.pool)
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 1
+
+
+def test_starvation_shows_up_as_timeouts(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    assert pool_stats(engine.pool)["timeouts"] == 1
+
+
+def test_counters_survive_dispose(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.connect():
+        pass
+    engine.dispose()
+    assert pool_stats(engine.pool)["checkouts"] == 1
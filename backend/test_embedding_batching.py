@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import numpy as np
+
+from llm.embeddings import BatchingEmbeddingClient, FakeEmbeddingProvider
+
+
+class CountingProvider(FakeEmbeddingProvider):
+    def __init__(self, fail=False):
+        super().__init__(dim=16)
+        self.batch_sizes = []
+        self.fail = fail
+
+    async def embed(self, texts):
+        self.batch_sizes.append(len(texts))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return await super().embed(texts)
+
+
+def test_concurrent_calls_share_batches():
+    provider = CountingProvider()
+    client = BatchingEmbeddingClient(provider, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(client.embed([f"text {i}", f"more {i}"]) for i in range(10)))
+
+    results = asyncio.run(run())
+
+    assert provider.batch_sizes == [8, 8, 4]
+    for i, vectors in enumerate(results):
+        expected = np.stack([provider.embed_one(f"text {i}"), provider.embed_one(f"more {i}")])
+        assert (vectors == expected).all()
+    assert client.stats()["requests"] == 10 and client.stats()["batches"] == 3
+
+
+def test_partial_batch_flushes_after_max_wait():
+    provider = CountingProvider()
+    client = BatchingEmbeddingClient(provider, max_batch_size=100, max_wait_ms=20)
+    started = time.perf_counter()
+    vectors = asyncio.run(client.embed(["alone"]))
+    elapsed = time.perf_counter() - started
+
+    assert vectors.shape == (1, 16)
+    assert provider.batch_sizes == [1]
+    assert 0.02 <= elapsed < 0.5
+
+
+def test_oversized_request_is_split():
+    provider = CountingProvider()
+    client = BatchingEmbeddingClient(provider, max_batch_size=4)
+    vectors = asyncio.run(client.embed([f"t{i}" for i in range(10)]))
+    assert vectors.shape == (10, 16)
+    assert sorted(provider.batch_sizes) == [2, 4, 4]
+
+
+def test_errors_reach_every_caller():
+    client = BatchingEmbeddingClient(CountingProvider(fail=True), max_batch_size=4, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(client.embed(["a"]), client.embed(["b"]), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
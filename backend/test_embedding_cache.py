@@ -0,0 +1,94 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import database.models as models
+from knowledge.embedding_cache import EmbeddingCache, text_hash
+from llm.embeddings import FakeEmbeddingProvider
+
+
+class RecordingProvider(FakeEmbeddingProvider):
+    def __init__(self, dim=16):
+        super().__init__(dim)
+        self.embedded = []
+
+    async def embed(self, texts):
+        self.embedded.extend(texts)
+        return await super().embed(texts)
+
+
+def make_cache(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(models.Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    return EmbeddingCache(async_sessionmaker(engine, expire_on_commit=False))
+
+
+def test_normalized_text_shares_a_hash():
+    assert text_hash("Hello   world\n") == text_hash("Hello world")
+    assert text_hash("Hello world") != text_hash("hello world")
+
+
+def test_reupload_only_embeds_changed_chunks(tmp_path):
+    cache = make_cache(tmp_path)
+    provider = RecordingProvider()
+    chunks = [f"chunk number {i}" for i in range(20)]
+
+    first, hits = asyncio.run(cache.embed(provider, chunks))
+    assert hits == 0 and len(provider.embedded) == 20
+
+    edited = chunks[:]
+    edited[7] = "an edited chunk"
+    provider.embedded.clear()
+    second, hits = asyncio.run(cache.embed(provider, edited))
+
+    assert hits == 19 and provider.embedded == ["an edited chunk"]
+    assert (second[:7] == first[:7]).all() and (second[8:] == first[8:]).all()
+    assert cache.stats()["hit_ratio"] == 19 / 40
+
+
+def test_duplicates_in_a_batch_are_embedded_once(tmp_path):
+    cache = make_cache(tmp_path)
+    provider = RecordingProvider()
+    vectors, _ = asyncio.run(cache.embed(provider, ["same text", "same  text", "other"]))
+    assert provider.embedded == ["same text", "other"]
+    assert (vectors[0] == vectors[1]).all()
+
+
+def test_entries_are_per_model(tmp_path):
+    cache = make_cache(tmp_path)
+    asyncio.run(cache.embed(RecordingProvider(dim=16), ["text"]))
+    other = RecordingProvider(dim=32)
+    vectors, hits = asyncio.run(cache.embed(other, ["text"]))
+    assert hits == 0 and vectors.shape == (1, 32)
+
+
+def test_no_session_is_held_during_the_provider_call(tmp_path):
+    cache = make_cache(tmp_path)
+    sessions = cache.session_factory
+    open_sessions = []
+
+    class TrackedSession:
+        async def __aenter__(self):
+            self.db = await sessions().__aenter__()
+            open_sessions.append(self)
+            return self.db
+
+        async def __aexit__(self, *exc_info):
+            open_sessions.remove(self)
+            await self.db.__aexit__(*exc_info)
+
+    class CheckingProvider(RecordingProvider):
+        async def embed(self, texts):
+            assert not open_sessions
+            return await super().embed(texts)
+
+    cache.session_factory = TrackedSession
+    provider = CheckingProvider()
+    asyncio.run(cache.embed(provider, ["first", "second"]))
+    vectors, hits = asyncio.run(cache.embed(provider, ["first", "second"]))
+    assert hits == 2 and provider.embedded == ["first", "second"]
@@ -0,0 +1,93 @@
+import numpy as np
+
+from knowledge.keyword import (
+    KeywordIndex,
+    KeywordIndexBuilder,
+    decode_varints,
+    encode_varints,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from knowledge.store import DocumentManifest, KnowledgeStore
+
+
+def build(path, texts, first_id=1):
+    builder = KeywordIndexBuilder()
+    builder.add_many((first_id + i, text) for i, text in enumerate(texts))
+    builder.save(path)
+    return KeywordIndex(path)
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 16384, 2**31, 2**62], dtype=np.int64)
+    encoded = encode_varints(values)
+    assert len(encoded) < values.nbytes
+    assert (decode_varints(np.frombuffer(encoded, dtype=np.uint8)) == values).all()
+
+
+def test_identifiers_are_kept_whole():
+    tokens = tokenize("Error E-404 on SKU AB-1234/x, see v1.2.3")
+    assert "e-404" in tokens and "ab-1234/x" in tokens and "v1.2.3" in tokens
+    assert "404" in tokens and "1234" in tokens
+
+
+def test_exact_identifier_ranks_first(tmp_path):
+    texts = [f"Product {i} ships in a blue box with a manual." for i in range(200)]
+    texts[137] = "Product SKU-99812 ships in a red box with a manual."
+    index = build(tmp_path / "doc.bm25", texts)
+
+    ids, scores = index.search("where is sku-99812", 3)
+    assert ids[0] == 138 and len(ids) == 1
+    assert scores[0] > 0
+
+    ids, _ = index.search("blue box", 5)
+    assert len(ids) == 5 and 138 not in ids
+
+
+def test_bm25_prefers_higher_term_frequency(tmp_path):
+    index = build(tmp_path / "doc.bm25", ["cats", "cats cats cats", "dogs", "cats and dogs and birds"])
+    ids, _ = index.search("cats", 4)
+    assert list(ids) == [2, 1, 4]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([([1, 2, 3], 1.0), ([3, 4], 1.0)], k=60)
+    assert fused[0][0] == 3
+    assert dict(fused)[3] == 1 / 63 + 1 / 61
+    # A zero weight drops that ranking
+    assert [item for item, _ in reciprocal_rank_fusion([([1], 0.0), ([2], 1.0)])] == [2]
+
+
+def test_store_searches_across_documents(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    build(store.keyword_path("a"), ["alpha error code E-17", "nothing here"], first_id=1)
+    build(store.keyword_path("b"), ["beta", "error code E-17 again, E-17"], first_id=10)
+    store.publish(DocumentManifest("a", 1, ["a"], "a"))
+    store.publish(DocumentManifest("b", 1, ["b"], "b"))
+
+    ids, scores = store.search_keywords(["a", "b", "missing"], "E-17", 5)
+    assert set(ids) == {1, 11}
+    assert list(scores) == sorted(scores, reverse=True)
+
+    store.delete("a")
+    assert store.open_keywords("a") is None
+
+
+def test_document_wide_index_keeps_versions_comparable(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    base = [f"filler text number {i}" for i in range(1000)] + ["refund policy for damaged items"]
+    edited = ["refund policy for damaged items, updated", "shipping times"]
+    # Version 2 keyword-indexes all live chunks together instead of only the added segment
+    segment = store.new_segment("doc")
+    build(store.keyword_path(segment), edited, first_id=2000)
+    keywords = store.new_segment("doc")
+    build(store.keyword_path(keywords), base + edited)
+    store.publish(DocumentManifest("doc", 2, ["doc", segment], keywords))
+
+    ids, scores = store.search_keywords(["doc"], "refund policy", 2)
+    assert set(ids) == {1001, 1002}
+    assert abs(scores[0] - scores[1]) / scores[0] < 0.2
+
+    assert store.manifest("doc").keywords == keywords
+    store.delete("doc")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from knowledge.ingest import chunk_text, iter_text_file, save_upload
+
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(f"word{i}" for i in range(500))
+    chunks = list(chunk_text([text], chunk_size=100, overlap=20))
+
+    assert all(len(chunk) <= 100 for _, chunk in chunks)
+    for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start == start + len(chunk) - 20
+    # Offsets point back into the original text
+    for start, chunk in chunks:
+        assert text[start:start + len(chunk)] == chunk
+    assert chunks[-1][0] + len(chunks[-1][1]) == len(text)
+
+
+def test_chunking_is_independent_of_segment_boundaries():
+    text = "".join(f"sentence {i}. " for i in range(300))
+    whole = list(chunk_text([text], chunk_size=120, overlap=30))
+    pieces = list(chunk_text((text[i:i + 7] for i in range(0, len(text), 7)), chunk_size=120, overlap=30))
+    assert whole == pieces
+
+
+def test_invalid_overlap_is_rejected():
+    with pytest.raises(ValueError):
+        list(chunk_text(["abc"], chunk_size=10, overlap=10))
+
+
+def test_save_upload_and_incremental_decode(tmp_path):
+    # A multi-byte character straddles the 1 MB block boundary
+    data = ("a" * (1024 * 1024 - 1) + "é" + "tail").encode("utf-8")
+    size, digest = save_upload(io.BytesIO(data), tmp_path / "doc.txt")
+
+    assert size == len(data) and len(digest) == 64
+    assert "".join(iter_text_file(tmp_path / "doc.txt")) == data.decode("utf-8")
+
+
+def test_chunk_boundaries_resync_after_an_edit():
+    text = " ".join(f"word{i * 7919 % 1000}" for i in range(20000))
+    before = {chunk for _, chunk in chunk_text([text], chunk_size=500, overlap=100)}
+
+    changed = []
+    for at in range(5000, 150000, 15000):
+        edited = text[:at] + " a few inserted words " + text[at:]
+        after = [chunk for _, chunk in chunk_text([edited], chunk_size=500, overlap=100)]
+        changed.append(sum(chunk not in before for chunk in after))
+
+    # Out of ~290 chunks, only the ones around each edit change
+    assert 0 < min(changed) and sum(changed) / len(changed) <= 5
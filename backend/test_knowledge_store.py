@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from knowledge.index import VectorIndex
+from knowledge.store import DocumentManifest, KnowledgeStore, VectorFile
+
+
+def random_vectors(rows, dim, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+
+
+def write_document(store, document_id, ids, vectors, block=100):
+    writer = store.writer(document_id, vectors.shape[1], len(ids))
+    for start in range(0, len(ids), block):
+        writer.write(ids[start:start + block], vectors[start:start + block])
+    writer.close()
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    vectors = random_vectors(1000, 32)
+    write_document(store, "doc", np.arange(1000) + 5000, vectors)
+
+    vector_file = VectorFile(store.vector_path("doc"))
+    assert isinstance(vector_file.vectors, np.memmap)
+    assert vector_file.count == 1000 and vector_file.dim == 32
+    assert list(vector_file.ids[:3]) == [5000, 5001, 5002]
+    np.testing.assert_allclose(np.linalg.norm(vector_file.vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_search_matches_in_memory_index(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    vectors = random_vectors(2000, 32)
+    ids = np.arange(2000)
+    write_document(store, "a", ids[:1200], vectors[:1200])
+    write_document(store, "b", ids[1200:], vectors[1200:])
+    store.publish(DocumentManifest("a", 1, ["a"], "a"))
+    store.publish(DocumentManifest("b", 1, ["b"], "b"))
+
+    index = VectorIndex(32)
+    index.add(ids, vectors)
+    queries = random_vectors(10, 32, seed=1)
+    expected_ids, expected_scores = index.search_batch(queries, 5)
+    found_ids, found_scores = store.search(["a", "b", "missing"], queries, 5)
+
+    assert (found_ids == expected_ids).all()
+    np.testing.assert_allclose(found_scores, expected_scores, rtol=1e-5)
+
+
+def test_replaced_file_is_reopened(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    write_document(store, "doc", np.arange(10), random_vectors(10, 8))
+    first = store.open("doc")
+    assert store.open("doc") is first
+
+    write_document(store, "doc", np.arange(20) + 100, random_vectors(20, 8, seed=2))
+    second = store.open("doc")
+    assert second is not first and second.count == 20
+    # The old mapping stays readable for searches already holding it
+    assert first.count == 10 and first.ids[0] == 0
+
+
+def test_incomplete_write_never_replaces_file(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    writer = store.writer("doc", 8, 10)
+    writer.write(np.arange(5), random_vectors(5, 8))
+    with pytest.raises(ValueError):
+        writer.close()
+    writer.abort()
+    assert store.open("doc") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_large_documents_use_ivf(tmp_path):
+    store = KnowledgeStore(tmp_path, ann_min_chunks=500, nprobe=64)
+    vectors = random_vectors(2000, 16)
+    write_document(store, "doc", np.arange(2000), vectors, block=512)
+    store.build_ann("doc")
+    store.publish(DocumentManifest("doc", 1, ["doc"], "doc"))
+
+    vector_file = store.open("doc")
+    assert vector_file.ann is not None
+    ids, _ = store.search(["doc"], vectors[:5], 1)
+    assert list(ids[:, 0]) == [0, 1, 2, 3, 4]
+
+    store.delete("doc")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_tombstones_and_compaction(tmp_path):
+    store = KnowledgeStore(tmp_path)
+    vectors = random_vectors(300, 16)
+    write_document(store, "doc", np.arange(200), vectors[:200])
+    # Version 2 adds rows 200-299 as a segment and removes rows 0-49
+    segment = store.new_segment("doc")
+    write_document(store, segment, np.arange(200, 300), vectors[200:])
+    store.publish(DocumentManifest("doc", 2, ["doc", segment], "doc", dead=range(50)))
+
+    ids, _ = store.search(["doc"], vectors[:60], 1)
+    assert not np.isin(ids, np.arange(50)).any()
+    assert list(ids[50:, 0]) == list(range(50, 60))
+    ids, _ = store.search(["doc"], vectors[250:252], 1)
+    assert list(ids[:, 0]) == [250, 251]
+
+    compacted = store.new_segment("doc")
+    assert store.compact_vectors(store.manifest("doc"), compacted) == 250
+    store.publish(DocumentManifest("doc", 2, [compacted], compacted))
+    store.delete_segments(["doc", segment])
+
+    vector_file = store.open(compacted)
+    assert sorted(vector_file.ids) == list(range(50, 300))
+    found, _ = store.search(["doc"], vectors[50:300], 1)
+    assert (found[:, 0] == np.arange(50, 300)).all()
@@ -0,0 +1,206 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+import database.models as models
+from database.database import SessionLocal, async_engine, engine
+from database.models import KnowledgeChunk
+from knowledge.router import router
+from knowledge.service import KNOWLEDGE_DIR, knowledge_store, retrieve
+from llm.embeddings import FakeEmbeddingProvider, set_embedding_provider
+
+TEXT = " ".join(f"Sentence number {i} about the knowledge base." for i in range(60))
+
+
+class RecordingEmbeddingProvider(FakeEmbeddingProvider):
+    """Fake embeddings under a model name of its own, so no earlier test warms the cache for it"""
+
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.model = f"recording-{uuid.uuid4().hex}"
+        self.fail = fail
+        self.texts = []
+
+    async def embed(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding service unavailable")
+        self.texts.extend(texts)
+        return await super().embed(texts)
+
+
+@pytest.fixture
+def embeddings():
+    provider = RecordingEmbeddingProvider()
+    set_embedding_provider(provider)
+    yield provider
+    set_embedding_provider(None)
+
+
+@pytest.fixture
+def client():
+    # The upload path uses the app's own engines, which conftest points at a scratch database
+    models.Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+def staged_files(extension: str):
+    return [path for path in KNOWLEDGE_DIR.glob(f"*{extension}") if path.is_file()]
+
+
+def test_upload_ingests_a_new_document(client):
+    response = client.post(
+        "/api/knowledge/upload",
+        files={"file": ("notes.txt", TEXT.encode(), "text/plain")},
+        data={"chunk_size": "200", "chunk_overlap": "40"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["filename"] == "notes.txt"
+    assert body["size_bytes"] == len(TEXT)
+    assert body["version"] == 1
+    assert body["chunk_count"] > 1 and body["chunks_added"] == body["chunk_count"] and body["chunks_removed"] == 0
+
+    with SessionLocal() as db:
+        chunks = db.query(KnowledgeChunk).filter_by(document_id=body["document_id"]).order_by(KnowledgeChunk.position).all()
+    assert len(chunks) == body["chunk_count"]
+    assert all(len(chunk.text) <= 200 and chunk.content_hash for chunk in chunks)
+    assert all(TEXT[chunk.start_offset:chunk.start_offset + len(chunk.text)] == chunk.text for chunk in chunks)
+    assert knowledge_store.manifest(body["document_id"]) is not None
+    assert (KNOWLEDGE_DIR / (body["document_id"] + ".txt")).is_file()
+
+
+def test_unsupported_extension_is_415_and_removes_the_staged_file(client):
+    response = client.post("/api/knowledge/upload", files={"file": ("slides.pptx", b"not text", "application/octet-stream")})
+
+    assert response.status_code == 415
+    assert "Unsupported file type" in response.json()["detail"]
+    assert staged_files(".pptx") == []
+
+
+def test_overlap_not_below_chunk_size_is_422(client):
+    before = staged_files(".txt")
+    response = client.post(
+        "/api/knowledge/upload",
+        files={"file": ("notes.txt", TEXT.encode(), "text/plain")},
+        data={"chunk_size": "100", "chunk_overlap": "100"},
+    )
+
+    assert response.status_code == 422
+    assert staged_files(".txt") == before
+
+
+def paragraph(words, count, start=0):
+    return " ".join(f"{words} paragraph {i} has its own distinct wording here." for i in range(start, start + count))
+
+
+V1 = " ".join([paragraph("Opening", 30), paragraph("Zebra", 10), paragraph("Closing", 30)])
+# Drops the zebra paragraphs and inserts giraffe ones earlier, which shifts the closing chunks
+V2 = " ".join([paragraph("Opening", 15), paragraph("Giraffe", 20), paragraph("Opening", 15, start=15), paragraph("Closing", 30)])
+
+
+def upload(client, text, document_id=None):
+    data = {"chunk_size": "200", "chunk_overlap": "40"}
+    if document_id:
+        data["document_id"] = document_id
+    response = client.post("/api/knowledge/upload", files={"file": ("animals.txt", text.encode(), "text/plain")}, data=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def chunk_rows(document_id):
+    with SessionLocal() as db:
+        return db.query(KnowledgeChunk).filter_by(document_id=document_id).order_by(KnowledgeChunk.id).all()
+
+
+def retrieved_texts(client, document_id, query):
+    return [chunk.text for chunk in client.portal.call(retrieve, [document_id], query, 50)]
+
+
+def test_new_version_embeds_only_added_chunks(client, embeddings, monkeypatch):
+    # Compact through the endpoint below rather than in the upload's background task
+    monkeypatch.setattr(config, "KNOWLEDGE_COMPACTION_RATIO", 2.0)
+    monkeypatch.setattr(config, "KNOWLEDGE_MAX_SEGMENTS", 100)
+    first = upload(client, V1)
+    before = {row.id: row for row in chunk_rows(first["document_id"])}
+    embeddings.texts.clear()
+
+    second = upload(client, V2, first["document_id"])
+
+    assert second["version"] == 2
+    assert second["chunks_added"] > 0 and second["chunks_removed"] > 0
+    rows = chunk_rows(first["document_id"])
+    added = [row for row in rows if row.version_added == 2]
+    removed = [row for row in rows if row.version_removed == 2]
+    kept = [row for row in rows if row.version_added == 1 and row.version_removed is None]
+    assert len(added) == second["chunks_added"] and len(removed) == second["chunks_removed"]
+    assert all("Giraffe" in row.text or "Opening" in row.text for row in added)
+    assert any("Zebra" in row.text for row in removed)
+    # Kept chunks keep their row; the closing ones moved behind the inserted text
+    assert any(before[row.id].position != row.position for row in kept if "Closing" in row.text)
+    assert sorted(row.position for row in rows if row.version_removed is None) == list(range(second["chunk_count"]))
+    assert all(V2[row.start_offset:row.start_offset + len(row.text)] == row.text for row in rows if row.version_removed is None)
+    # Only the added chunks reached the embedding provider
+    assert sorted(embeddings.texts) == sorted(row.text for row in added)
+
+    assert not any("Zebra" in text for text in retrieved_texts(client, first["document_id"], "Zebra paragraph"))
+    assert any("Giraffe" in text for text in retrieved_texts(client, first["document_id"], "Giraffe paragraph"))
+
+    compacted = client.post(f"/api/knowledge/documents/{first['document_id']}/compact").json()
+    assert compacted["compacted"] and compacted["chunk_count"] == second["chunk_count"]
+    assert not any(row.version_removed for row in chunk_rows(first["document_id"]))
+    assert not any("Zebra" in text for text in retrieved_texts(client, first["document_id"], "Zebra paragraph"))
+    assert any("Giraffe" in text for text in retrieved_texts(client, first["document_id"], "Giraffe paragraph"))
+
+
+def test_same_content_reupload_is_a_no_op(client, embeddings):
+    first = upload(client, V1)
+    manifest = knowledge_store.manifest(first["document_id"])
+    embeddings.texts.clear()
+
+    again = upload(client, V1, first["document_id"])
+
+    assert again["version"] == 1 and again["chunks_added"] == 0 and again["chunks_removed"] == 0
+    assert embeddings.texts == []
+    assert knowledge_store.manifest(first["document_id"]).to_json() == manifest.to_json()
+
+
+def test_failed_indexing_keeps_the_previous_version(client, embeddings):
+    first = upload(client, V1)
+    manifest = knowledge_store.manifest(first["document_id"])
+    before = [(row.id, row.position, row.version_removed) for row in chunk_rows(first["document_id"])]
+
+    set_embedding_provider(RecordingEmbeddingProvider(fail=True))
+    with pytest.raises(RuntimeError):
+        upload(client, V2, first["document_id"])
+
+    assert client.get(f"/api/knowledge/documents/{first['document_id']}").json()["version"] == 1
+    assert [(row.id, row.position, row.version_removed) for row in chunk_rows(first["document_id"])] == before
+    assert knowledge_store.manifest(first["document_id"]).to_json() == manifest.to_json()
+
+    # The same upload goes through once the provider is back
+    set_embedding_provider(embeddings)
+    assert upload(client, V2, first["document_id"])["version"] == 2
+
+
+def test_reupload_indexes_a_document_whose_first_indexing_failed(client, embeddings):
+    set_embedding_provider(RecordingEmbeddingProvider(fail=True))
+    with pytest.raises(RuntimeError):
+        upload(client, V1)
+    with SessionLocal() as db:
+        document_id = db.query(KnowledgeChunk.document_id).order_by(KnowledgeChunk.id.desc()).first()[0]
+    assert knowledge_store.manifest(document_id) is None
+
+    set_embedding_provider(embeddings)
+    again = upload(client, V1, document_id)
+
+    assert again["version"] == 1
+    assert knowledge_store.manifest(document_id) is not None
+    assert any("Zebra" in text for text in retrieved_texts(client, document_id, "Zebra paragraph"))
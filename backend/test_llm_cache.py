@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from llm.cache import ResponseCache, cache_key, cached_generate, set_response_cache
+from llm.providers import FakeProvider, set_provider
+
+
+class CountingProvider(FakeProvider):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def generate(self, prompt: str, **params) -> str:
+        self.calls += 1
+        return await super().generate(prompt, **params)
+
+
+@pytest.fixture
+def provider(tmp_path):
+    provider = CountingProvider()
+    set_provider(provider)
+    set_response_cache(ResponseCache(str(tmp_path / "llm_cache.db"), max_entries=8))
+    yield provider
+    set_provider(None)
+    set_response_cache(None)
+
+
+def test_identical_prompts_hit_the_cache(provider):
+    first = asyncio.run(cached_generate("User Query: hours?"))
+    second = asyncio.run(cached_generate("User Query: hours?"))
+    assert first == second == "You said: User Query: hours?"
+    assert provider.calls == 1
+
+
+def test_key_covers_model_and_params():
+    provider = FakeProvider()
+    other = FakeProvider()
+    other.model = "echo-2"
+    assert cache_key(provider, "hi", {"temperature": 0}) != cache_key(provider, "hi", {"temperature": 1})
+    assert cache_key(provider, "hi", {}) != cache_key(other, "hi", {})
+    assert cache_key(provider, "hi", {"a": 1, "b": 2}) == cache_key(provider, "hi", {"b": 2, "a": 1})
+
+
+def test_sqlite_tier_is_shared(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    asyncio.run(ResponseCache(path).set("key", "answer"))
+    other = ResponseCache(path)
+    assert asyncio.run(other.get("key")) == "answer"
+    assert asyncio.run(other.get("key")) == "answer"
+    assert (other.l2_hits, other.l1_hits) == (1, 1)
+
+
+def test_entries_expire(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm_cache.db"))
+    asyncio.run(cache.set("short", "a", ttl=0.05))
+    asyncio.run(cache.set("long", "b"))
+    time.sleep(0.1)
+    assert asyncio.run(cache.get("short")) is None
+    assert asyncio.run(cache.get("long")) == "b"
+    assert asyncio.run(cache.sweep()) == 1
+
+
+def test_memory_tier_is_bounded():
+    cache = ResponseCache(max_entries=2)
+    for key in "abc":
+        asyncio.run(cache.set(key, key.upper()))
+    assert asyncio.run(cache.get("a")) is None
+    assert asyncio.run(cache.get("c")) == "C"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,38 @@
+import asyncio
+
+from llm.providers import FakeProvider, get_provider, set_provider
+
+
+def test_fake_provider_is_deterministic():
+    provider = FakeProvider()
+    assert asyncio.run(provider.generate("hello")) == "You said: hello"
+
+
+def test_fake_provider_streams_tokens():
+    async def collect():
+        return [token async for token in FakeProvider().stream("hello world")]
+
+    tokens = asyncio.run(collect())
+    assert len(tokens) == 4
+    assert "".join(tokens).strip() == "You said: hello world"
+
+
+def test_concurrent_calls_do_not_block_each_other():
+    provider = FakeProvider(delay=0.1)
+
+    async def many():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(provider.generate(str(i)) for i in range(20)))
+        return loop.time() - started
+
+    assert asyncio.run(many()) < 0.5
+
+
+def test_set_provider_overrides_default():
+    custom = FakeProvider()
+    set_provider(custom)
+    try:
+        assert get_provider() is custom
+    finally:
+        set_provider(None)
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from chat.semantic_cache import SemanticCache
+from llm.embeddings import FakeEmbeddingProvider
+
+
+def make_cache(**kwargs) -> SemanticCache:
+    return SemanticCache(FakeEmbeddingProvider(), **kwargs)
+
+
+def remember(cache: SemanticCache, message: str, response: str) -> None:
+    cache.add(asyncio.run(cache.embed(message)), message, response)
+
+
+def ask(cache: SemanticCache, message: str):
+    return cache.lookup(asyncio.run(cache.embed(message)))
+
+
+def test_rephrased_question_hits():
+    cache = make_cache(threshold=0.9)
+    remember(cache, "What are your opening hours?", "9 to 5")
+    hit = ask(cache, "what are your opening hours")
+    assert hit is not None and hit.response == "9 to 5"
+    assert hit.similarity >= 0.9
+    assert ask(cache, "How do I reset my password?") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_threshold_is_respected():
+    strict = make_cache(threshold=1.0)
+    remember(strict, "What are your opening hours?", "9 to 5")
+    assert ask(strict, "What are your opening hours today?") is None
+    with pytest.raises(ValueError):
+        make_cache(threshold=0)
+
+
+def test_oldest_entry_is_evicted_when_full():
+    cache = make_cache(max_entries=2)
+    remember(cache, "first question", "1")
+    remember(cache, "second question", "2")
+    remember(cache, "third question", "3")
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert ask(cache, "first question") is None
+    assert ask(cache, "third question").response == "3"
+
+
+def test_entries_expire():
+    cache = make_cache(ttl=0.05)
+    remember(cache, "What are your opening hours?", "9 to 5")
+    time.sleep(0.1)
+    assert ask(cache, "What are your opening hours?") is None
+    # Expired slots are reused without counting as evictions
+    remember(cache, "How do I reset my password?", "Use the link")
+    assert len(cache) == 1 and cache.stats()["evictions"] == 0
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from datetime import datetime
+
+from chat.sessions import InMemorySessionBackend, SQLiteSessionBackend, SessionStore, TieredSessionBackend
+
+
+def test_known_session_is_reused():
+    store = SessionStore(InMemorySessionBackend())
+    session_id = asyncio.run(store.get_or_create())
+    assert asyncio.run(store.get_or_create(session_id)) == session_id
+    stats = asyncio.run(store.stats())
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_unknown_session_gets_new_id():
+    store = SessionStore(InMemorySessionBackend())
+    assert asyncio.run(store.get_or_create("does-not-exist")) != "does-not-exist"
+
+
+def test_capacity_evicts_least_recently_used():
+    backend = InMemorySessionBackend(max_sessions=2)
+    store = SessionStore(backend)
+    first = asyncio.run(store.get_or_create())
+    second = asyncio.run(store.get_or_create())
+    asyncio.run(store.get_or_create(first))
+    asyncio.run(store.get_or_create())
+
+    assert len(backend) == 2
+    assert asyncio.run(backend.get(first)) is not None
+    assert asyncio.run(backend.get(second)) is None
+    assert backend.evictions == 1
+
+
+def test_sweep_removes_idle_sessions():
+    backend = InMemorySessionBackend(idle_ttl=0.05)
+    store = SessionStore(backend)
+    session_id = asyncio.run(store.get_or_create())
+    time.sleep(0.1)
+
+    assert asyncio.run(backend.sweep()) == 1
+    assert len(backend) == 0
+    assert asyncio.run(store.get_or_create(session_id)) != session_id
+
+
+def test_sqlite_backend_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    # Two stores on the same file stand in for two uvicorn workers
+    worker_a = SessionStore(TieredSessionBackend(InMemorySessionBackend(refresh_on_read=False), SQLiteSessionBackend(path)))
+    worker_b = SessionStore(TieredSessionBackend(InMemorySessionBackend(refresh_on_read=False), SQLiteSessionBackend(path)))
+
+    session_id = asyncio.run(worker_a.get_or_create())
+    assert asyncio.run(worker_b.get_or_create(session_id)) == session_id
+    assert isinstance(asyncio.run(worker_b.get(session_id))["created_at"], datetime)
+
+
+def test_sqlite_backend_expires_idle_sessions(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), idle_ttl=0.05)
+    asyncio.run(backend.set("abc", {"created_at": datetime.utcnow()}))
+    time.sleep(0.1)
+
+    assert asyncio.run(backend.get("abc")) is None
+    assert asyncio.run(backend.sweep()) == 1
+    assert asyncio.run(backend.size()) == 0
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from llm.cache import cached_generate, set_response_cache
+from llm.providers import FakeProvider, set_provider
+from llm.singleflight import SingleFlight
+
+
+class CountingProvider(FakeProvider):
+    def __init__(self, delay: float):
+        super().__init__(delay)
+        self.calls = 0
+
+    async def generate(self, prompt: str, **params) -> str:
+        self.calls += 1
+        return await super().generate(prompt, **params)
+
+
+def test_concurrent_identical_generations_share_one_call(monkeypatch):
+    import config
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    provider = CountingProvider(delay=0.05)
+    set_provider(provider)
+    set_response_cache(None)
+
+    async def burst():
+        return await asyncio.gather(
+            *[cached_generate("User Query: hours?") for _ in range(20)],
+            cached_generate("User Query: prices?"),
+        )
+
+    try:
+        responses = asyncio.run(burst())
+    finally:
+        set_provider(None)
+    assert responses[:20] == ["You said: User Query: hours?"] * 20
+    assert provider.calls == 2
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def burst():
+        return await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 2}
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("key", slow))
+        second = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
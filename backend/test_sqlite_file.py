@@ -0,0 +1,36 @@
+import asyncio
+import sqlite3
+
+from database.sqlite import SharedSQLiteFile
+
+
+def test_queries_round_trip(tmp_path):
+    db = SharedSQLiteFile(str(tmp_path / "shared.db"), schema=["CREATE TABLE items (key TEXT PRIMARY KEY, value TEXT)"])
+
+    async def scenario():
+        assert await db.execute("INSERT INTO items VALUES (?, ?)", ("a", "1")) == 1
+        assert await db.fetchone("UPDATE items SET value = ? WHERE key = ? RETURNING value", ("2", "a")) == ("2",)
+        return await db.fetchone("SELECT COUNT(*) FROM items")
+
+    assert asyncio.run(scenario()) == (1,)
+
+
+def test_lock_wait_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "shared.db")
+    db = SharedSQLiteFile(path, schema=["CREATE TABLE items (key TEXT PRIMARY KEY)"])
+    # Another worker holding the write lock
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+
+    async def scenario():
+        write = asyncio.ensure_future(db.execute("INSERT INTO items VALUES (?)", ("a",)))
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not write.done()
+        other_worker.execute("COMMIT")
+        return await write
+
+    assert asyncio.run(scenario()) == 1
+    other_worker.close()
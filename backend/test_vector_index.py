@@ -0,0 +1,44 @@
+import numpy as np
+
+from knowledge.index import VectorIndex, normalize, search_matrix
+
+
+def brute_force(vectors, queries, k):
+    scores = normalize(queries) @ normalize(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def test_batched_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, 32))
+    queries = rng.normal(size=(7, 32))
+    index = VectorIndex(dim=32, capacity=16)
+    index.add(np.arange(1000) + 100, vectors)
+
+    ids, scores = index.search_batch(queries, k=10)
+    assert ids.shape == (7, 10)
+    np.testing.assert_array_equal(ids - 100, brute_force(vectors, queries, 10))
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_block_scoring_matches_single_pass():
+    rng = np.random.default_rng(1)
+    vectors = normalize(rng.normal(size=(500, 16)))
+    queries = normalize(rng.normal(size=(3, 16)))
+    ids = np.arange(500)
+    single = search_matrix(vectors, ids, queries, k=5, block_rows=10000)
+    blocked = search_matrix(vectors, ids, queries, k=5, block_rows=37)
+    np.testing.assert_array_equal(single[0], blocked[0])
+
+
+def test_k_larger_than_index_and_masking():
+    index = VectorIndex(dim=2)
+    index.add([1, 2, 3], [[1, 0], [0, 1], [1, 1]])
+
+    ids, scores = index.search([1, 0], k=10)
+    assert list(ids) == [1, 3, 2]
+    assert np.isclose(scores[0], 1.0)
+
+    valid = np.array([False, True, True])
+    ids, _ = search_matrix(index.vectors, index.ids, normalize([[1, 0]]), k=3, valid=valid)
+    assert list(ids[0]) == [3, 2]
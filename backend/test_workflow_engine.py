@@ -0,0 +1,204 @@
+import asyncio
+import time
+
+import pytest
+
+from knowledge.context import RetrievedContext, count_tokens
+from knowledge.service import RetrievedChunk
+import workflows.engine
+from workflows.engine import NODE_EXECUTORS, PromptTemplate, WorkflowEngine, WorkflowError, topological_order, parse_graph
+from workflows.memo import NodeMemo
+
+# The "Chat With AI" template from templates.ts, with a second knowledge base
+NODES = [
+    {"id": "1", "type": "userQuery", "data": {"query": "What is the main theme?"}},
+    {"id": "2", "type": "knowledgeBase", "data": {"fileName": "a.pdf"}},
+    {"id": "5", "type": "knowledgeBase", "data": {"fileName": "b.pdf"}},
+    {"id": "3", "type": "llm", "data": {"prompt": "CONTEXT: {context}\nUser Query: {query}"}},
+    {"id": "4", "type": "output", "data": {"result": ""}},
+]
+EDGES = [
+    {"source": "1", "target": "2", "sourceHandle": "query", "targetHandle": "query"},
+    {"source": "1", "target": "5", "sourceHandle": "query", "targetHandle": "query"},
+    {"source": "2", "target": "3", "sourceHandle": "context", "targetHandle": "context"},
+    {"source": "5", "target": "3", "sourceHandle": "context", "targetHandle": "context"},
+    {"source": "1", "target": "3", "sourceHandle": "query"},
+    {"source": "3", "target": "4", "sourceHandle": "output", "targetHandle": "output"},
+]
+
+
+def test_topological_order():
+    nodes, edges = parse_graph(NODES, EDGES)
+    order = topological_order(nodes, edges)
+    assert order.index("1") < order.index("2") < order.index("3") < order.index("4")
+    assert order.index("5") < order.index("3")
+
+
+def test_cycle_is_rejected():
+    nodes, edges = parse_graph(NODES[:1] + NODES[3:4], [
+        {"source": "1", "target": "3"},
+        {"source": "3", "target": "1"},
+    ])
+    with pytest.raises(WorkflowError):
+        topological_order(nodes, edges)
+
+
+def test_edge_without_endpoint_is_rejected():
+    with pytest.raises(WorkflowError, match="e1-3"):
+        parse_graph(NODES, [{"id": "e1-3", "source": "1"}])
+
+
+async def file_name_knowledge_base(node, inputs, context):
+    return {"context": f"[{node.data['fileName']}]"}
+
+
+def test_run_renders_prompt():
+    executors = dict(NODE_EXECUTORS, knowledgeBase=file_name_knowledge_base)
+    run = asyncio.run(WorkflowEngine(executors).run(NODES, EDGES, query="Hello"))
+    assert "User Query: Hello" in run.result
+    assert "[a.pdf]" in run.result and "[b.pdf]" in run.result
+    assert [timing.node_id for timing in run.timings][-1] == "4"
+
+
+def test_independent_branches_run_concurrently():
+    async def slow_knowledge_base(node, inputs, context):
+        await asyncio.sleep(0.2)
+        return {"context": node.data["fileName"]}
+
+    executors = dict(NODE_EXECUTORS, knowledgeBase=slow_knowledge_base)
+    started = time.perf_counter()
+    run = asyncio.run(WorkflowEngine(executors).run(NODES, EDGES))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    timings = {timing.node_id: timing for timing in run.timings}
+    assert timings["5"].started_ms < timings["2"].finished_ms
+
+
+def test_prompt_template_leaves_unknown_placeholders():
+    template = PromptTemplate.parse("CONTEXT: {context}\nQ: {query} {unknown}")
+    assert template.fields == ("context", "query", "unknown")
+    # Values are inserted once, never re-scanned for placeholders
+    assert template.render({"context": "{query}", "query": "hi"}) == "CONTEXT: {query}\nQ: hi {unknown}"
+
+
+def test_prompt_tokens_are_counted_by_parts():
+    template = PromptTemplate.parse("User Query: {query} {unknown}").prefixed("Context:\n", "context", "\n\n")
+    values = {"query": "What is the main theme?", "context": "The report covers quarterly revenue."}
+    prompt = template.render(values)
+
+    assert prompt == "Context:\nThe report covers quarterly revenue.\n\nUser Query: What is the main theme? {unknown}"
+    assert template.token_count({name: count_tokens(value) for name, value in values.items()}) == count_tokens(prompt)
+
+
+def test_plans_are_cached_by_graph_content():
+    executors = dict(NODE_EXECUTORS, knowledgeBase=file_name_knowledge_base)
+    engine = WorkflowEngine(executors)
+    first = asyncio.run(engine.plan(NODES, EDGES))
+    # Canvas-only changes do not invalidate the plan
+    moved = [
+        dict(node, position={"x": 1, "y": 2}, selected=True, data=dict(node["data"], selected=True, xPos=1))
+        for node in NODES
+    ]
+    assert asyncio.run(engine.plan(moved, EDGES)) is first
+    assert engine.plan_stats()["hits"] == 1
+
+    edited = [dict(node, data={"prompt": "{query}!"}) if node["type"] == "llm" else node for node in NODES]
+    second = asyncio.run(engine.plan(edited, EDGES))
+    assert second is not first
+    assert isinstance(second.nodes["3"].prepared, PromptTemplate)
+    assert second.nodes["2"].prepared is None  # replaced executor, so no knowledge-base preparer
+    run = asyncio.run(engine.run_plan(second, query="Hello"))
+    # The edited template has no {context} slot, so the context is put in front of it
+    assert run.result.startswith("You said: Context:\n[a.pdf]") and run.result.endswith("\n\nHello!")
+
+
+def test_plans_resolve_file_names_on_every_run(monkeypatch):
+    latest = {"a.pdf": "doc-1"}
+
+    async def resolve(data):
+        return [latest[data["fileName"]]] if "fileName" in data else [data["documentId"]]
+
+    monkeypatch.setattr(workflows.engine, "resolve_document_ids", resolve)
+    nodes = NODES + [{"id": "6", "type": "knowledgeBase", "data": {"documentId": "doc-9"}}]
+    plan = asyncio.run(WorkflowEngine().compile(nodes, EDGES))
+    # Only explicit ids are fixed in the plan
+    assert plan.nodes["2"].prepared is None
+    assert plan.nodes["6"].prepared == ("doc-9",)
+
+    assert asyncio.run(workflows.engine.knowledge_base_fingerprint(plan.nodes["2"])) == [["doc-1", None]]
+    # Uploading the file again without a document id creates a new document
+    latest["a.pdf"] = "doc-2"
+    assert asyncio.run(workflows.engine.knowledge_base_fingerprint(plan.nodes["2"])) == [["doc-2", None]]
+
+
+def test_plan_is_isolated_from_caller_mutation():
+    engine = WorkflowEngine(dict(NODE_EXECUTORS, knowledgeBase=file_name_knowledge_base))
+    nodes = [dict(node, data=dict(node["data"])) for node in NODES]
+    plan = asyncio.run(engine.compile(nodes, EDGES))
+    nodes[0]["data"]["query"] = "changed"
+    assert plan.nodes["1"].data["query"] == "What is the main theme?"
+    with pytest.raises(TypeError):
+        plan.nodes["1"].data["query"] = "changed"
+
+
+def test_rerun_after_prompt_edit_only_executes_dirty_nodes():
+    retrievals = []
+
+    async def counting_knowledge_base(node, inputs, context):
+        retrievals.append(node.id)
+        return {"context": f"[{node.data['fileName']}]"}
+
+    memo = NodeMemo()
+    engine = WorkflowEngine(dict(NODE_EXECUTORS, knowledgeBase=counting_knowledge_base), memo=memo)
+    asyncio.run(engine.run(NODES, EDGES, query="Hello", workflow_id="stack-1"))
+    assert sorted(retrievals) == ["2", "5"]
+
+    edited = [dict(node, data={"prompt": "Answer briefly. {context} {query}"}) if node["type"] == "llm" else node for node in NODES]
+    run = asyncio.run(engine.run(edited, EDGES, query="Hello", workflow_id="stack-1"))
+    assert sorted(retrievals) == ["2", "5"]
+    assert run.result.startswith("You said: Answer briefly.")
+    cached = {timing.node_id for timing in run.timings if timing.cached}
+    assert cached == {"1", "2", "5"}
+
+    # A new query dirties everything; another workflow shares nothing
+    asyncio.run(engine.run(edited, EDGES, query="Bye", workflow_id="stack-1"))
+    asyncio.run(engine.run(edited, EDGES, query="Bye", workflow_id="stack-2"))
+    assert len(retrievals) == 6
+
+    assert {entry.node_id for entry in memo.entries("stack-2")} == {"1", "2", "3", "4", "5"}
+    assert memo.evict("stack-2", node_id="2") == 1
+    assert memo.evict("stack-2") == 4
+    assert memo.entries("stack-2") == [] and memo.entries("stack-1")
+
+
+def test_runs_without_workflow_id_are_not_memoized():
+    memo = NodeMemo()
+    engine = WorkflowEngine(dict(NODE_EXECUTORS, knowledgeBase=file_name_knowledge_base), memo=memo)
+    asyncio.run(engine.run(NODES, EDGES, query="Hello"))
+    assert len(memo) == 0
+
+
+def test_llm_node_packs_retrieved_chunks_to_its_budget():
+    text = " ".join(f"word{i}" for i in range(300))
+    chunks = [
+        RetrievedChunk(1, "doc", 0, 0, text[:600], score=0.9),
+        RetrievedChunk(2, "doc", 1, 500, text[500:1100], score=0.8),  # overlaps chunk 1 by 100 characters
+        RetrievedChunk(3, "doc", 2, 500, text[500:600], score=0.7),  # inside chunk 1
+        RetrievedChunk(4, "doc", 3, 1000, text[1000:1600], score=0.1),
+    ]
+
+    async def chunk_knowledge_base(node, inputs, context):
+        return {"context": RetrievedContext("\n\n".join(chunk.text for chunk in chunks), chunks)}
+
+    # Room for chunk 1 and the part of chunk 2 it does not cover, but not for chunk 4 as well
+    budget = count_tokens(text[:600]) + count_tokens(text[600:1100]) + 10
+    nodes = [dict(node, data={"prompt": "{context}", "contextTokens": budget}) if node["type"] == "llm" else node for node in NODES]
+    engine = WorkflowEngine(dict(NODE_EXECUTORS, knowledgeBase=chunk_knowledge_base))
+    run = asyncio.run(engine.run(nodes[:2] + nodes[3:], [edge for edge in EDGES if "5" not in (edge["source"], edge["target"])], query="q"))
+    llm = run.outputs["3"]
+    # Chunks 1 and 2 join into one continuous span; chunk 4 no longer fits
+    assert run.result == "You said: " + text[:1100].strip()
+    assert (llm["chunks_used"], llm["chunks_deduplicated"], llm["chunks_skipped"]) == (2, 1, 1)
+    assert llm["context_tokens"] == count_tokens(text[:1100].strip()) <= budget
+    assert llm["prompt_tokens"] >= llm["context_tokens"]
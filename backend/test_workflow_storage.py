@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import database.models as models
+from database.database import get_async_db
+from llm.providers import FakeProvider, ProviderError, set_provider
+from workflows.router import router
+from workflows.storage import compact_graph, etag_matches
+
+NODES = [
+    {
+        "id": "1", "type": "userQuery", "position": {"x": 100, "y": 200}, "data": {"query": ""},
+        "width": 250, "height": 120, "selected": True, "dragging": False,
+        "positionAbsolute": {"x": 100, "y": 200}, "xPos": 100, "yPos": 200,
+    },
+    {"id": "2", "type": "output", "position": {"x": 450, "y": 200}, "data": {"result": "", "selected": True, "xPos": 450}},
+]
+EDGES = [{"id": "e1-2", "source": "1", "target": "2", "sourceHandle": "query", "targetHandle": None, "selected": False}]
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'workflows.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(models.Base.metadata.create_all)
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_async_db] = get_test_db
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        yield client
+        client.portal.call(engine.dispose)
+
+
+def test_compact_graph_drops_ui_state():
+    graph = compact_graph(NODES, EDGES)
+    assert graph["nodes"][0] == {"id": "1", "type": "userQuery", "position": {"x": 100, "y": 200}, "data": {"query": ""}}
+    assert graph["nodes"][1]["data"] == {"result": ""}
+    assert graph["edges"][0] == {"id": "e1-2", "source": "1", "target": "2", "sourceHandle": "query"}
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_save_and_conditional_get(client):
+    saved = client.post("/api/workflows", json={"id": "stack-1", "name": "Chat", "nodes": NODES, "edges": EDGES})
+    assert saved.status_code == 200
+    etag = saved.headers["etag"]
+    assert "selected" not in json.dumps(saved.json()["nodes"])
+
+    assert client.get("/api/workflows/stack-1", headers={"If-None-Match": etag}).status_code == 304
+    # Moving the selection or dragging nothing is not a change
+    unchanged = [dict(NODES[0], selected=False, dragging=True), NODES[1]]
+    resaved = client.post(
+        "/api/workflows",
+        json={"id": "stack-1", "name": "Chat", "nodes": unchanged, "edges": EDGES},
+        headers={"If-None-Match": etag}
+    )
+    assert resaved.status_code == 304
+
+    moved = [dict(NODES[0], position={"x": 120, "y": 200}), NODES[1]]
+    updated = client.post("/api/workflows", json={"id": "stack-1", "name": "Chat", "nodes": moved, "edges": EDGES})
+    assert updated.json()["version"] == 2
+    assert updated.headers["etag"] != etag
+    assert client.get("/api/workflows/stack-1", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/workflows/missing").status_code == 404
+
+
+def test_list_pagination_and_etag(client):
+    for i in range(5):
+        client.post("/api/workflows", json={"id": f"stack-{i}", "name": f"Stack {i}", "nodes": NODES, "edges": EDGES})
+
+    first = client.get("/api/workflows", params={"limit": 2})
+    body = first.json()
+    assert body["total"] == 5 and len(body["items"]) == 2
+    second = client.get("/api/workflows", params={"limit": 2, "offset": 2}).json()
+    assert not {item["id"] for item in body["items"]} & {item["id"] for item in second["items"]}
+
+    etag = first.headers["etag"]
+    assert client.get("/api/workflows", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 304
+    client.post("/api/workflows", json={"id": "stack-new", "name": "New", "nodes": NODES, "edges": EDGES})
+    assert client.get("/api/workflows", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200
+
+
+class FailingProvider(FakeProvider):
+    async def generate(self, prompt: str, **params) -> str:
+        raise ProviderError("upstream unavailable")
+
+
+def test_invalid_graph_is_400_and_node_failure_is_502(client):
+    cycle = [{"source": "1", "target": "2"}, {"source": "2", "target": "1"}]
+    assert client.post("/api/workflows/run", json={"nodes": NODES, "edges": cycle}).status_code == 400
+
+    nodes = [NODES[0], {"id": "3", "type": "llm", "data": {"prompt": "{query}"}}]
+    set_provider(FailingProvider())
+    try:
+        failed = client.post("/api/workflows/run", json={"nodes": nodes, "edges": [{"source": "1", "target": "3"}], "query": "hi"})
+    finally:
+        set_provider(None)
+    assert failed.status_code == 502
+    assert "upstream unavailable" in failed.json()["detail"]
@@ -0,0 +1,513 @@
+"""
+Server-side execution engine for saved stacks.
+
+A stack is the node/edge graph the editor produces (userQuery -> knowledgeBase
+-> llm -> output). The engine topologically sorts it and runs every node as
+soon as all of its upstream nodes have finished, so independent branches
+(e.g. two knowledge bases feeding one LLM node) run concurrently on the
+event loop instead of one after another.
+
+Validation and planning happen once per distinct graph: ``compile`` turns
+the node/edge JSON into an immutable ``WorkflowPlan`` (topological order,
+incoming edges, parsed prompt templates, resolved knowledge-base
+documents), and the engine caches plans by a hash of the graph's
+execution-relevant content. With a ``NodeMemo`` and a workflow id, node
+outputs are memoized so a re-run after an edit only executes the nodes
+whose configuration or upstream inputs changed.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+import config
+from knowledge.context import RetrievedContext, count_tokens, count_tokens_uncached, pack_context
+from knowledge.service import explicit_document_ids, knowledge_store, resolve_document_ids, retrieve
+from llm.cache import cached_generate
+from llm.singleflight import SingleFlight
+from workflows.memo import NodeMemo, memo_key
+from workflows.storage import node_data
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowError(Exception):
+    """Raised when a workflow graph is invalid"""
+
+
+class NodeExecutionError(WorkflowError):
+    """Raised when a node fails while the workflow runs (e.g. the LLM provider errors)"""
+
+
+@dataclass(frozen=True)
+class WorkflowNode:
+    id: str
+    type: str
+    data: Mapping[str, Any] = field(default_factory=dict)
+    # Whatever the node type's preparer computed at compile time
+    prepared: Any = None
+
+
+@dataclass(frozen=True)
+class WorkflowEdge:
+    source: str
+    target: str
+    source_handle: Optional[str] = None
+    target_handle: Optional[str] = None
+
+
+@dataclass
+class NodeTiming:
+    node_id: str
+    node_type: str
+    started_ms: float
+    finished_ms: float
+    cached: bool = False  # outputs replayed from the node memo
+
+    @property
+    def duration_ms(self) -> float:
+        return self.finished_ms - self.started_ms
+
+
+@dataclass
+class WorkflowResult:
+    outputs: Dict[str, Dict[str, Any]]
+    result: Optional[Any]
+    timings: List[NodeTiming]
+    total_ms: float
+
+
+@dataclass
+class RunContext:
+    """Per-run state shared with node executors"""
+    query: Optional[str] = None
+
+
+# An executor receives the node, its inputs grouped by target handle and the
+# run context, and returns its outputs keyed by source handle.
+NodeExecutor = Callable[[WorkflowNode, Dict[str, List[Any]], RunContext], Awaitable[Dict[str, Any]]]
+
+NODE_EXECUTORS: Dict[str, NodeExecutor] = {}
+
+# A preparer runs once per compiled plan and returns the node's ``prepared`` value
+NodePreparer = Callable[[WorkflowNode], Awaitable[Any]]
+
+NODE_PREPARERS: Dict[str, NodePreparer] = {}
+
+# A fingerprint describes external state a node reads (e.g. document versions)
+# and becomes part of its memo key on every run
+NodeFingerprint = Callable[[WorkflowNode], Awaitable[Any]]
+
+NODE_FINGERPRINTS: Dict[str, NodeFingerprint] = {}
+
+
+def register_executor(node_type: str):
+    """Register the coroutine that runs nodes of ``node_type``"""
+    def decorator(func: NodeExecutor) -> NodeExecutor:
+        NODE_EXECUTORS[node_type] = func
+        return func
+    return decorator
+
+
+def register_preparer(node_type: str):
+    """Register the coroutine that precomputes per-node state for ``node_type`` at compile time"""
+    def decorator(func: NodePreparer) -> NodePreparer:
+        NODE_PREPARERS[node_type] = func
+        return func
+    return decorator
+
+
+def register_fingerprint(node_type: str):
+    """Register the coroutine that describes external state read by nodes of ``node_type``"""
+    def decorator(func: NodeFingerprint) -> NodeFingerprint:
+        NODE_FINGERPRINTS[node_type] = func
+        return func
+    return decorator
+
+
+def parse_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    """Convert the editor's node/edge JSON into engine objects"""
+    parsed_nodes = []
+    for node in nodes:
+        if "id" not in node or "type" not in node:
+            raise WorkflowError("Every node needs an 'id' and a 'type'")
+        parsed_nodes.append(WorkflowNode(id=str(node["id"]), type=node["type"], data=node_data(node)))
+
+    parsed_edges = []
+    for edge in edges:
+        if edge.get("source") is None or edge.get("target") is None:
+            raise WorkflowError(f"Every edge needs a 'source' and a 'target': {edge}")
+        parsed_edges.append(WorkflowEdge(
+            source=str(edge["source"]),
+            target=str(edge["target"]),
+            source_handle=edge.get("sourceHandle"),
+            target_handle=edge.get("targetHandle"),
+        ))
+    return parsed_nodes, parsed_edges
+
+
+def topological_order(nodes: List[WorkflowNode], edges: List[WorkflowEdge]) -> List[str]:
+    """Return node ids in dependency order (Kahn's algorithm)"""
+    node_ids = [node.id for node in nodes]
+    if len(set(node_ids)) != len(node_ids):
+        raise WorkflowError("Duplicate node ids in workflow")
+
+    in_degree = {node_id: 0 for node_id in node_ids}
+    downstream: Dict[str, List[str]] = {node_id: [] for node_id in node_ids}
+    for edge in edges:
+        if edge.source not in in_degree or edge.target not in in_degree:
+            raise WorkflowError(f"Edge {edge.source} -> {edge.target} references an unknown node")
+        downstream[edge.source].append(edge.target)
+        in_degree[edge.target] += 1
+
+    ready = [node_id for node_id in node_ids if in_degree[node_id] == 0]
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for target in downstream[node_id]:
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                ready.append(target)
+
+    if len(order) != len(node_ids):
+        raise WorkflowError("Workflow contains a cycle")
+    return order
+
+
+def _pick_output(outputs: Dict[str, Any], handle: Optional[str]) -> Any:
+    if handle and handle in outputs:
+        return outputs[handle]
+    # Edges drawn without a handle carry the node's primary output
+    return next(iter(outputs.values()), None)
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """A validated graph, ready to run any number of times"""
+    key: str
+    order: Tuple[str, ...]
+    nodes: Mapping[str, WorkflowNode]
+    incoming: Mapping[str, Tuple[WorkflowEdge, ...]]
+    # Hash of each node's type and data, the static part of its memo key
+    config_keys: Mapping[str, str]
+    compile_ms: float
+
+
+def graph_key(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> str:
+    """Hash of what execution depends on; canvas positions and selection are ignored"""
+    content = [
+        [[node.get("id"), node.get("type"), node_data(node)] for node in nodes],
+        [[edge.get("source"), edge.get("target"), edge.get("sourceHandle"), edge.get("targetHandle")] for edge in edges],
+    ]
+    payload = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class WorkflowEngine:
+    """Runs a workflow graph, scheduling independent branches concurrently"""
+
+    def __init__(
+        self,
+        executors: Optional[Dict[str, NodeExecutor]] = None,
+        preparers: Optional[Dict[str, NodePreparer]] = None,
+        fingerprints: Optional[Dict[str, NodeFingerprint]] = None,
+        plan_cache_size: int = 256,
+        memo: Optional[NodeMemo] = None,
+    ):
+        self.executors = executors if executors is not None else NODE_EXECUTORS
+        self.preparers = preparers if preparers is not None else self._builtin(NODE_PREPARERS)
+        self.fingerprints = fingerprints if fingerprints is not None else self._builtin(NODE_FINGERPRINTS)
+        self.memo = memo
+        self.plan_cache_size = plan_cache_size
+        self._plans: "OrderedDict[str, WorkflowPlan]" = OrderedDict()
+        self._compiling = SingleFlight()
+        self.plan_hits = 0
+        self.plan_misses = 0
+
+    def _builtin(self, hooks: Dict[str, Any]) -> Dict[str, Any]:
+        # Hooks belong to the built-in executor of their type; a replaced executor does not get them
+        return {
+            node_type: hook for node_type, hook in hooks.items()
+            if self.executors.get(node_type) is NODE_EXECUTORS.get(node_type)
+        }
+
+    async def compile(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], key: Optional[str] = None) -> WorkflowPlan:
+        """Validate and plan a graph without consulting the plan cache"""
+        started = time.perf_counter()
+        parsed_nodes, parsed_edges = parse_graph(nodes, edges)
+        order = topological_order(parsed_nodes, parsed_edges)
+        for node in parsed_nodes:
+            if node.type not in self.executors:
+                raise WorkflowError(f"Unsupported node type: {node.type}")
+
+        # Plans are shared between runs, so they get their own read-only copy of node data
+        frozen_nodes = [replace(node, data=MappingProxyType(copy.deepcopy(dict(node.data)))) for node in parsed_nodes]
+        prepared = await asyncio.gather(*[
+            self.preparers[node.type](node) if node.type in self.preparers else _nothing()
+            for node in frozen_nodes
+        ])
+        by_id = {node.id: replace(node, prepared=value) for node, value in zip(frozen_nodes, prepared)}
+        incoming: Dict[str, List[WorkflowEdge]] = {node_id: [] for node_id in by_id}
+        for edge in parsed_edges:
+            incoming[edge.target].append(edge)
+
+        return WorkflowPlan(
+            key=key or graph_key(nodes, edges),
+            order=tuple(order),
+            nodes=MappingProxyType(by_id),
+            incoming=MappingProxyType({node_id: tuple(edges) for node_id, edges in incoming.items()}),
+            config_keys=MappingProxyType({
+                node.id: memo_key(node.type, dict(node.data)) for node in frozen_nodes
+            }),
+            compile_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    async def plan(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> WorkflowPlan:
+        """The cached plan for this graph, compiling it on first use"""
+        key = graph_key(nodes, edges)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            self.plan_hits += 1
+            return plan
+        self.plan_misses += 1
+        plan = await self._compiling.do(key, lambda: self.compile(nodes, edges, key))
+        self._plans[key] = plan
+        while len(self._plans) > self.plan_cache_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    def plan_stats(self) -> Dict[str, Any]:
+        lookups = self.plan_hits + self.plan_misses
+        return {
+            "size": len(self._plans),
+            "max_size": self.plan_cache_size,
+            "hits": self.plan_hits,
+            "misses": self.plan_misses,
+            "hit_ratio": self.plan_hits / lookups if lookups else 0.0,
+        }
+
+    def clear_plans(self) -> None:
+        self._plans.clear()
+
+    async def run(
+        self,
+        nodes: List[Dict[str, Any]],
+        edges: List[Dict[str, Any]],
+        query: Optional[str] = None,
+        workflow_id: Optional[str] = None,
+    ) -> WorkflowResult:
+        return await self.run_plan(await self.plan(nodes, edges), query=query, workflow_id=workflow_id)
+
+    async def _memo_key(self, plan: WorkflowPlan, node: WorkflowNode, query: Optional[str], keys: Dict[str, str]) -> str:
+        fingerprint = await self.fingerprints[node.type](node) if node.type in self.fingerprints else None
+        upstream = [[edge.source_handle, edge.target_handle, keys[edge.source]] for edge in plan.incoming[node.id]]
+        return memo_key(plan.config_keys[node.id], query, fingerprint, upstream)
+
+    async def run_plan(self, plan: WorkflowPlan, query: Optional[str] = None, workflow_id: Optional[str] = None) -> WorkflowResult:
+        """Run a compiled plan; node outputs are memoized when the engine has a memo and ``workflow_id`` is given"""
+        context = RunContext(query=query)
+        memo = self.memo if workflow_id is not None else None
+        outputs: Dict[str, Dict[str, Any]] = {}
+        keys: Dict[str, str] = {}
+        timings: Dict[str, NodeTiming] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        run_started = time.perf_counter()
+
+        async def run_node(node_id: str) -> None:
+            node = plan.nodes[node_id]
+            # Tasks are created in topological order, so upstream tasks exist
+            upstream = [tasks[edge.source] for edge in plan.incoming[node_id]]
+            if upstream:
+                await asyncio.gather(*upstream)
+
+            inputs: Dict[str, List[Any]] = {}
+            for edge in plan.incoming[node_id]:
+                handle = edge.target_handle or edge.source_handle or "input"
+                inputs.setdefault(handle, []).append(_pick_output(outputs[edge.source], edge.source_handle))
+
+            started = time.perf_counter()
+            entry = None
+            try:
+                if memo is not None:
+                    keys[node_id] = await self._memo_key(plan, node, query, keys)
+                    entry = memo.get(workflow_id, keys[node_id])
+                if entry is not None:
+                    outputs[node_id] = entry.outputs
+                else:
+                    outputs[node_id] = await self.executors[node.type](node, inputs, context)
+            except Exception as e:
+                raise NodeExecutionError(f"Node {node_id} ({node.type}) failed: {str(e)}") from e
+            finished = time.perf_counter()
+            if memo is not None and entry is None:
+                memo.put(workflow_id, keys[node_id], node_id, node.type, outputs[node_id], (finished - started) * 1000)
+            timings[node_id] = NodeTiming(
+                node_id=node_id,
+                node_type=node.type,
+                started_ms=(started - run_started) * 1000,
+                finished_ms=(finished - run_started) * 1000,
+                cached=entry is not None,
+            )
+
+        for node_id in plan.order:
+            tasks[node_id] = asyncio.ensure_future(run_node(node_id))
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        total_ms = (time.perf_counter() - run_started) * 1000
+        result = None
+        for node_id in plan.order:
+            if plan.nodes[node_id].type == "output":
+                result = outputs[node_id].get("output")
+        logger.info(f"Workflow run finished in {total_ms:.1f}ms ({len(plan.order)} nodes)")
+        return WorkflowResult(
+            outputs=outputs,
+            result=result,
+            timings=[timings[node_id] for node_id in plan.order],
+            total_ms=total_ms,
+        )
+
+
+async def _nothing() -> None:
+    return None
+
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A prompt split once into literal text and ``{name}`` placeholders"""
+    literals: Tuple[str, ...]
+    fields: Tuple[str, ...]
+
+    @classmethod
+    def parse(cls, template: str) -> "PromptTemplate":
+        pieces = PLACEHOLDER_PATTERN.split(template)
+        return cls(literals=tuple(pieces[0::2]), fields=tuple(pieces[1::2]))
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[name] if name in values else "{" + name + "}")
+            parts.append(literal)
+        return "".join(parts)
+
+    def prefixed(self, before: str, name: str, after: str) -> "PromptTemplate":
+        """This template behind ``before{name}after``"""
+        return PromptTemplate(literals=(before, after + self.literals[0], *self.literals[1:]), fields=(name, *self.fields))
+
+    def token_count(self, field_tokens: Dict[str, int]) -> int:
+        """Tokens of the rendered prompt from per-field counts; the literals are counted through the cache"""
+        total = sum(count_tokens(literal) for literal in self.literals)
+        return total + sum(field_tokens[name] if name in field_tokens else count_tokens("{" + name + "}") for name in self.fields)
+
+
+@lru_cache(maxsize=1024)
+def parse_template(template: str) -> PromptTemplate:
+    return PromptTemplate.parse(template)
+
+
+def render_prompt(template: str, values: Dict[str, str]) -> str:
+    """Fill ``{name}`` placeholders, leaving unknown ones untouched"""
+    return parse_template(template).render(values)
+
+
+def _join(values: List[Any]) -> str:
+    return "\n\n".join(str(value) for value in values if value)
+
+
+@register_executor("userQuery")
+async def run_user_query(node: WorkflowNode, inputs: Dict[str, List[Any]], context: RunContext) -> Dict[str, Any]:
+    query = context.query if context.query is not None else node.data.get("query", "")
+    return {"query": query}
+
+
+@register_preparer("knowledgeBase")
+async def prepare_knowledge_base(node: WorkflowNode) -> Optional[Tuple[str, ...]]:
+    # Only explicit ids are fixed; a file name may point at a newer upload on the next run
+    return tuple(explicit_document_ids(node.data)) or None
+
+
+@register_fingerprint("knowledgeBase")
+async def knowledge_base_fingerprint(node: WorkflowNode) -> List[List[Any]]:
+    # A re-upload bumps the manifest version, so retrieval is redone after it
+    document_ids = list(node.prepared) if node.prepared else await resolve_document_ids(node.data)
+    versions = []
+    for document_id in document_ids:
+        manifest = knowledge_store.manifest(document_id)
+        versions.append([document_id, manifest.version if manifest else None])
+    return versions
+
+
+@register_executor("knowledgeBase")
+async def run_knowledge_base(node: WorkflowNode, inputs: Dict[str, List[Any]], context: RunContext) -> Dict[str, Any]:
+    document_ids = list(node.prepared) if node.prepared else await resolve_document_ids(node.data)
+    query = _join(inputs.get("query", [])) or (context.query or "")
+    chunks = await retrieve(
+        document_ids,
+        query,
+        k=int(node.data.get("topK") or config.KNOWLEDGE_TOP_K),
+        vector_weight=node.data.get("vectorWeight"),
+        keyword_weight=node.data.get("keywordWeight"),
+    )
+    return {
+        # Reads as the joined text; an LLM node downstream repacks the chunks to its token budget
+        "context": RetrievedContext("\n\n".join(chunk.text for chunk in chunks), chunks),
+        "chunks": [asdict(chunk) for chunk in chunks],
+    }
+
+
+@register_preparer("llm")
+async def prepare_llm(node: WorkflowNode) -> PromptTemplate:
+    return PromptTemplate.parse(node.data.get("prompt") or "{query}")
+
+
+@register_executor("llm")
+async def run_llm(node: WorkflowNode, inputs: Dict[str, List[Any]], context: RunContext) -> Dict[str, Any]:
+    query = _join(inputs.get("query", [])) or (context.query or "")
+    template = node.prepared or parse_template(node.data.get("prompt") or "{query}")
+
+    # Retrieved chunks from every knowledge base share one token budget; other text is kept whole
+    values = inputs.get("context", [])
+    plain = _join([value for value in values if not isinstance(value, RetrievedContext)])
+    chunks = [chunk for value in values if isinstance(value, RetrievedContext) for chunk in value.chunks]
+    budget = int(node.data.get("contextTokens") or config.LLM_CONTEXT_TOKEN_BUDGET)
+    plain_tokens = count_tokens_uncached(plain)
+    packed = pack_context(chunks, max(0, budget - plain_tokens))
+    context_text = _join([plain, packed.text])
+    # Counted by parts: the packer already counted every chunk it kept
+    context_tokens = plain_tokens + packed.tokens
+
+    if context_text and "context" not in template.fields:
+        # Templates such as "User Query: {query}" have no slot for the retrieved context
+        template = template.prefixed("Context:\n", "context", "\n\n")
+    prompt = template.render({"query": query, "context": context_text})
+    return {
+        "output": await cached_generate(prompt),
+        "prompt_tokens": template.token_count({"query": count_tokens_uncached(query), "context": context_tokens}),
+        "context_tokens": context_tokens,
+        "chunks_used": packed.chunks_used,
+        "chunks_skipped": packed.chunks_skipped,
+        "chunks_deduplicated": packed.chunks_deduplicated,
+    }
+
+
+@register_executor("output")
+async def run_output(node: WorkflowNode, inputs: Dict[str, List[Any]], context: RunContext) -> Dict[str, Any]:
+    values = [value for values in inputs.values() for value in values]
+    return {"output": _join(values)}
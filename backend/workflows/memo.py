@@ -0,0 +1,101 @@
+"""
+Per-node memoization of workflow runs.
+
+Each node's outputs are stored under a key derived from the node's
+configuration, the run's query, any external state it reads (e.g. the
+versions of the documents a knowledge base searches) and the keys of its
+upstream nodes. Editing one node changes its key and the keys of everything
+downstream of it, so a re-run executes only that dirty subgraph and replays
+the rest. Entries are grouped by workflow so they can be listed and evicted
+per workflow.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def memo_key(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class MemoEntry:
+    workflow_id: str
+    node_id: str
+    node_type: str
+    key: str
+    outputs: Dict[str, Any]
+    duration_ms: float
+    created_at: float
+    hits: int = 0
+
+
+class NodeMemo:
+    """LRU of node outputs shared by all workflows, bounded by entry count"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], MemoEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, workflow_id: str, key: str) -> Optional[MemoEntry]:
+        with self._lock:
+            entry = self._entries.get((workflow_id, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((workflow_id, key))
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def put(self, workflow_id: str, key: str, node_id: str, node_type: str, outputs: Dict[str, Any], duration_ms: float) -> None:
+        with self._lock:
+            self._entries[(workflow_id, key)] = MemoEntry(
+                workflow_id, node_id, node_type, key, outputs, duration_ms, time.time()
+            )
+            self._entries.move_to_end((workflow_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def entries(self, workflow_id: str) -> List[MemoEntry]:
+        """Entries of one workflow, least recently used first"""
+        with self._lock:
+            return [entry for (owner, _), entry in self._entries.items() if owner == workflow_id]
+
+    def evict(self, workflow_id: str, node_id: Optional[str] = None) -> int:
+        """Drop a workflow's entries, or only those of one node; returns how many were dropped"""
+        with self._lock:
+            doomed = [
+                slot for slot, entry in self._entries.items()
+                if entry.workflow_id == workflow_id and (node_id is None or entry.node_id == node_id)
+            ]
+            for slot in doomed:
+                del self._entries[slot]
+        return len(doomed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
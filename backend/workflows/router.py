@@ -0,0 +1,272 @@
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+import json
+import logging
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from database.database import get_async_db
+from database.models import Workflow
+from workflows.engine import NodeExecutionError, WorkflowEngine, WorkflowError
+from workflows.memo import NodeMemo
+from workflows.storage import compact_graph, dump_compact, etag_matches, list_etag, workflow_etag
+
+# Initialize router
+router = APIRouter(prefix="/workflows", tags=["Workflows"])
+logger = logging.getLogger(__name__)
+
+engine = WorkflowEngine(
+    plan_cache_size=config.WORKFLOW_PLAN_CACHE_SIZE,
+    memo=NodeMemo(max_entries=config.WORKFLOW_MEMO_MAX_ENTRIES)
+)
+
+class RunWorkflowRequest(BaseModel):
+    nodes: List[Dict[str, Any]]
+    edges: List[Dict[str, Any]] = []
+    query: Optional[str] = None
+    # Runs with a workflow id reuse the memoized outputs of unchanged nodes
+    workflow_id: Optional[str] = None
+
+class RunSavedWorkflowRequest(BaseModel):
+    query: Optional[str] = None
+
+class NodeTimingResponse(BaseModel):
+    node_id: str
+    node_type: str
+    started_ms: float
+    finished_ms: float
+    duration_ms: float
+    cached: bool = False
+
+class RunWorkflowResponse(BaseModel):
+    result: Optional[Any] = None
+    outputs: Dict[str, Dict[str, Any]]
+    timings: List[NodeTimingResponse]
+    total_ms: float
+
+class SaveWorkflowRequest(BaseModel):
+    id: Optional[str] = None
+    name: str = "Untitled"
+    description: Optional[str] = None
+    nodes: List[Dict[str, Any]] = []
+    edges: List[Dict[str, Any]] = []
+
+class WorkflowResponse(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    nodes: List[Dict[str, Any]]
+    edges: List[Dict[str, Any]]
+    version: int
+    updated_at: Optional[datetime] = None
+
+class WorkflowListResponse(BaseModel):
+    items: List[WorkflowResponse]
+    total: int
+    limit: int
+    offset: int
+
+def workflow_response(workflow: Workflow) -> dict:
+    graph = json.loads(workflow.graph)
+    return {
+        "id": workflow.id,
+        "name": workflow.name,
+        "description": workflow.description,
+        "nodes": graph["nodes"],
+        "edges": graph["edges"],
+        "version": workflow.version,
+        "updated_at": workflow.updated_at
+    }
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def set_validators(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # Clients may keep the body but must revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+
+@router.get("", response_model=WorkflowListResponse)
+async def list_workflows(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List saved workflows, most recently updated first.
+
+    The page's ETag is derived from the ids and ETags on it, so an
+    unchanged page is answered with 304 without loading any graph.
+    """
+    total = await db.scalar(select(func.count()).select_from(Workflow))
+    page = (await db.execute(
+        select(Workflow.id, Workflow.etag)
+        .order_by(Workflow.updated_at.desc(), Workflow.id)
+        .limit(limit)
+        .offset(offset)
+    )).all()
+    etag = list_etag(page, total, limit, offset)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    result = await db.execute(select(Workflow).where(Workflow.id.in_([row.id for row in page])))
+    workflows = {workflow.id: workflow for workflow in result.scalars()}
+    set_validators(response, etag)
+    return {
+        "items": [workflow_response(workflows[row.id]) for row in page if row.id in workflows],
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    }
+
+@router.post("", response_model=WorkflowResponse)
+async def save_workflow(
+    workflow: SaveWorkflowRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create or replace a workflow.
+
+    UI-only node and edge fields are dropped before storing. Saving content
+    identical to what is stored writes nothing; with a matching
+    ``If-None-Match`` it returns 304.
+    """
+    graph = dump_compact(compact_graph(workflow.nodes, workflow.edges))
+    etag = workflow_etag(workflow.name, workflow.description, graph)
+    stored = await db.get(Workflow, workflow.id) if workflow.id else None
+
+    if stored is None:
+        stored = Workflow(
+            id=workflow.id or str(uuid.uuid4()),
+            name=workflow.name,
+            description=workflow.description,
+            graph=graph,
+            etag=etag,
+            version=1
+        )
+        db.add(stored)
+    elif stored.etag != etag:
+        stored.name = workflow.name
+        stored.description = workflow.description
+        stored.graph = graph
+        stored.etag = etag
+        stored.version += 1
+    elif etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    else:
+        set_validators(response, etag)
+        return workflow_response(stored)
+
+    await db.commit()
+    await db.refresh(stored)
+    set_validators(response, etag)
+    return workflow_response(stored)
+
+@router.get("/{workflow_id}", response_model=WorkflowResponse)
+async def get_workflow(workflow_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Return a saved workflow, or 304 if the client's copy is current"""
+    workflow = await db.get(Workflow, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if etag_matches(request.headers.get("if-none-match"), workflow.etag):
+        return not_modified(workflow.etag)
+    set_validators(response, workflow.etag)
+    return workflow_response(workflow)
+
+def run_response(run) -> dict:
+    return {
+        "result": run.result,
+        "outputs": run.outputs,
+        "timings": [
+            {
+                "node_id": timing.node_id,
+                "node_type": timing.node_type,
+                "started_ms": timing.started_ms,
+                "finished_ms": timing.finished_ms,
+                "duration_ms": timing.duration_ms,
+                "cached": timing.cached,
+            }
+            for timing in run.timings
+        ],
+        "total_ms": run.total_ms,
+    }
+
+@router.post("/run", response_model=RunWorkflowResponse)
+async def run_workflow(run_request: RunWorkflowRequest):
+    """
+    Execute a stack on the server.
+
+    Independent branches run concurrently; per-node timings are returned
+    so slow nodes are easy to spot. The graph is compiled once and the
+    plan reused for every later run of the same graph. With a
+    ``workflow_id``, nodes whose config and inputs are unchanged since an
+    earlier run are replayed instead of executed (``cached`` timings).
+    """
+    try:
+        run = await engine.run(
+            run_request.nodes, run_request.edges, query=run_request.query, workflow_id=run_request.workflow_id
+        )
+    except NodeExecutionError as e:
+        # The graph is valid; a node or the service behind it failed
+        raise HTTPException(status_code=502, detail=str(e))
+    except WorkflowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return run_response(run)
+
+@router.get("/plans/stats")
+async def plan_stats():
+    """Compiled plan cache size and hit/miss counters for this worker"""
+    return engine.plan_stats()
+
+@router.get("/memo/stats")
+async def memo_stats():
+    """Node memo size and hit/miss counters for this worker"""
+    return engine.memo.stats()
+
+@router.get("/{workflow_id}/memo")
+async def list_memo_entries(workflow_id: str):
+    """Memoized node outputs of a workflow, least recently used first"""
+    return [
+        {
+            "node_id": entry.node_id,
+            "node_type": entry.node_type,
+            "key": entry.key,
+            "hits": entry.hits,
+            "duration_ms": entry.duration_ms,
+            "created_at": datetime.fromtimestamp(entry.created_at)
+        }
+        for entry in engine.memo.entries(workflow_id)
+    ]
+
+@router.delete("/{workflow_id}/memo")
+async def evict_memo_entries(workflow_id: str, node_id: Optional[str] = None):
+    """Drop a workflow's memoized outputs, or only those of one node"""
+    return {"evicted": engine.memo.evict(workflow_id, node_id)}
+
+@router.post("/{workflow_id}/run", response_model=RunWorkflowResponse)
+async def run_saved_workflow(workflow_id: str, run_request: RunSavedWorkflowRequest, db: AsyncSession = Depends(get_async_db)):
+    """Execute a saved workflow"""
+    workflow = await db.get(Workflow, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    graph = json.loads(workflow.graph)
+    try:
+        run = await engine.run(graph["nodes"], graph["edges"], query=run_request.query, workflow_id=workflow_id)
+    except NodeExecutionError as e:
+        # The graph is valid; a node or the service behind it failed
+        raise HTTPException(status_code=502, detail=str(e))
+    except WorkflowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return run_response(run)
+
+# Export the router
+__all__ = ["router"]
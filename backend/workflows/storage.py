@@ -0,0 +1,69 @@
+"""
+Compact storage format and ETags for saved workflows.
+
+The editor's node and edge objects carry React Flow state that only matters
+while the canvas is open (selection, drag state, measured sizes, absolute
+positions). ``compact_graph`` strips it so a stack is stored as the graph
+alone, serialised without whitespace. ETags are content hashes of that
+representation, so saving an unchanged stack or polling an unchanged list
+yields the same tag and can be answered with 304 Not Modified.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# React Flow fields that describe canvas state rather than the graph
+UI_ONLY_NODE_FIELDS = frozenset({
+    "xPos", "yPos", "dragging", "selected", "positionAbsolute", "width", "height", "zIndex", "isConnectable",
+})
+UI_ONLY_EDGE_FIELDS = frozenset({"selected", "zIndex"})
+# The node components also copy canvas state into ``data`` (see src/types/nodeTypes.ts)
+UI_ONLY_DATA_FIELDS = frozenset({"xPos", "yPos", "zIndex", "dragging", "selected", "isLoading"})
+
+
+def _strip(item: Dict[str, Any], fields: frozenset) -> Dict[str, Any]:
+    return {key: value for key, value in item.items() if key not in fields and value is not None}
+
+
+def node_data(node: Dict[str, Any]) -> Dict[str, Any]:
+    """A node's configuration without the canvas state mirrored into it"""
+    return _strip(node.get("data") or {}, UI_ONLY_DATA_FIELDS)
+
+
+def _compact_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    compact = _strip(node, UI_ONLY_NODE_FIELDS)
+    if "data" in compact:
+        compact["data"] = node_data(node)
+    return compact
+
+
+def compact_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "nodes": [_compact_node(node) for node in nodes],
+        "edges": [_strip(edge, UI_ONLY_EDGE_FIELDS) for edge in edges],
+    }
+
+
+def dump_compact(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+
+def workflow_etag(name: str, description: Optional[str], graph_json: str) -> str:
+    digest = hashlib.sha256(dump_compact([name, description, graph_json]).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def list_etag(entries: Iterable[Tuple[str, str]], total: int, limit: int, offset: int) -> str:
+    """ETag of one page of the workflow list, from the ids and ETags on it"""
+    digest = hashlib.sha256(dump_compact([list(map(list, entries)), total, limit, offset]).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers ``etag`` (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)